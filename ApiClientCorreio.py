@@ -1,44 +1,141 @@
 
 import base64
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import math
+import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 import data_defaults as data_c
-
-class ApiClientCorreios:
+from token_manager import TokenManager
+from tracking_state import MemoryTrackingState
+from tracking_table import TrackingTable
+from singleflight import SingleFlight
+from service_catalog import default_catalog
+from prepost_registry import MemoryPrePostRegistry, assign_idempotency_key, idempotency_key
+from rate_limiter import endpoint_of, parse_retry_after
+from resilience import DEFAULT_RETRY_POLICY, CircuitBreakers, CircuitOpenResponse
+from json_codec import CodecResponse, default_codec
+
+# Timeout padrão das requisições, em segundos: (conexão, leitura). Uma API que não responde libera a
+# thread (e a conexão do pool) em vez de prendê-la para sempre; as novas tentativas tratam o timeout.
+DEFAULT_TIMEOUT = (5, 30)
+
+class _BaseClientCorreios:
+    # Montagem dos payloads e tratamento das respostas, compartilhados pelos clientes síncrono e assíncrono.
+    # As subclasses implementam apenas o transporte (as chamadas HTTP).
     default_url = 'https://api.correios.com.br/'
-    def __init__(self, user, acess_code, post_card, contract, token, nuDR):
-        self.url = ''
+    tracking_limit = 50
+    price_lot_limit = 50
+    forecast_lot_limit = 50
+    pre_post_ok_status = (200, 201)
+    token_paths = {'cartao_postagem': 'token/v1/autentica/cartaopostagem',
+                   'contrato': 'token/v1/autentica/contrato',
+                   '': 'token/v1/autentica'}
+    def __init__(self, user, acess_code, post_card, contract, token, nuDR, timeout=DEFAULT_TIMEOUT,
+                 token_mode='cartao_postagem', token_manager=None, token_store=None, tracking_cache=None,
+                 quote_cache=None, coalesce_requests=True, service_catalog=None, pre_post_registry=None,
+                 rate_limiter=None, retry_policy=DEFAULT_RETRY_POLICY, circuit_breaker=True,
+                 metrics=None, json_codec=None, tracking_store=None):
         self.user =user
         self.acess_code = acess_code
         self.post_card = post_card
         self.contract = contract
         self.token = token 
         self.nuDR =nuDR
-        
-
-    def refresh_token(self, mode='cartao_postagem'):
-        """
-        Atualiza o token de autenticação para acesso a recursos específicos da API dos Correios.
-
-        Args:
-            mode (str): O modo de autenticação. Padrão é 'cartao_postagem'.
-            - cartao_postagem :  Token para as APIs : 27,34,35,36,37,41,76,78,80,83,87,93,566,587
-            - contrato : Token permite acessa  27,34,35,41,76,78,87,566,587
-            - '' (vazio)
-            
-
-        Returns:
-            dict: Um dicionário contendo informações sobre o token atualizado. 
-                As chaves são 'token_refresh_date', 'token_expire_date' e 'token'.
-                Retorna None em caso de erro.
+        self.timeout = timeout
+        self.token_mode = token_mode
+        if token_manager is None:
+            token_manager = TokenManager(store=token_store, namespace=f'{user}|{post_card}|{contract}')
+        self.tokens = token_manager
+        if token and token_manager.get(token_mode) is None:
+            # O token informado entra no gerenciador sem validade conhecida; se a API recusá-lo, é renovado.
+            token_manager.set(token_mode, {'token': token})
+        self.tracking_cache = tracking_cache
+        self.quote_cache = quote_cache
+        self.coalesce_requests = coalesce_requests
+        self.service_catalog = service_catalog if service_catalog is not None else default_catalog
+        self.pre_post_registry = pre_post_registry if pre_post_registry is not None else MemoryPrePostRegistry()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = CircuitBreakers() if circuit_breaker is True else (circuit_breaker or None)
+        self.metrics = metrics
+        self.json_codec = json_codec if json_codec is not None else default_codec()
+        self.tracking_store = tracking_store
+        self.tracking_state = MemoryTrackingState()
+
+    def _endpoint(self, url):
+        # Nome do endpoint da URL ('srorastro', 'preco', 'prazo', 'prepostagem' ou 'token').
+        return endpoint_of(url, self.default_url)
+
+    def _span(self, phase, endpoint):
+        # Mede uma fase ('token', 'build', 'network', 'parse') quando o cliente tem métricas configuradas.
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.span(phase, endpoint)
+
+    def _encode_body(self, endpoint, kwargs):
+        # Codifica o corpo json= uma única vez com o codec do cliente (as novas tentativas reaproveitam os bytes).
+        if kwargs.get('json') is None:
+            kwargs.pop('json', None)
+            return kwargs
+        with self._span('build', endpoint):
+            kwargs['data'] = self.json_codec.dumps(kwargs.pop('json'))
+        headers = dict(kwargs.get('headers') or {})
+        if not any(name.lower() == 'content-type' for name in headers):
+            headers['Content-Type'] = 'application/json'
+        kwargs['headers'] = headers
+        return kwargs
+
+    def _handle(self, endpoint, handler, response):
+        with self._span('parse', endpoint):
+            return handler(response)
+
+    def _record_request(self, endpoint, method, response, start, request_body=None):
+        if self.metrics is None:
+            return
+        self.metrics.record_request(endpoint, method, None if response is None else response.status_code,
+                                    time.perf_counter() - start, len(request_body or b''),
+                                    0 if response is None else len(response.content))
+
+    def _breaker(self, endpoint):
+        return self.circuit_breaker.get(endpoint) if self.circuit_breaker is not None else None
+
+    @staticmethod
+    def _record_outcome(breaker, status_code):
+        # Erros 5xx, timeouts e falhas de conexão (status_code None) contam como falha do endpoint.
+        if breaker is None:
+            return
+        if status_code is None or status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
 
-        Raises:
-            ValueError: Se o modo de autenticação não for reconhecido.
-        """
+    def _retry_delay(self, endpoint, attempt, response=None):
+        # Espera antes de repetir a chamada, ou None se ela não deve ser repetida.
+        if self.retry_policy is None:
+            return None
+        status_code = None if response is None else response.status_code
+        if not self.retry_policy.should_retry(endpoint, attempt, status_code):
+            return None
+        retry_after = None if response is None else parse_retry_after(response.headers.get('Retry-After'))
+        return self.retry_policy.backoff(attempt, retry_after)
 
+    def _token_info(self, mode, entry):
+        if entry is None:
+            return None
+        if mode == self.token_mode:
+            self.token = entry['token']
+        return {
+        'token_refresh_date' :entry['emissao'],
+        'token_expire_date' :entry['expiraEm'],
+        'token': entry['token']
+        }
 
-        
+    def _token_request(self, mode):
         basic =bytes(f'{self.user}:{self.acess_code}', encoding='utf-8')
         basic = str(base64.b64encode(basic), encoding='utf-8')
         
@@ -48,90 +145,679 @@ class ApiClientCorreios:
                     'Authorization': f'Basic {basic}'
                     }
 
+        url = f'{self.default_url}{self.token_paths[mode]}'
         if(mode == 'cartao_postagem'):
-
-            self.url = f'{self.default_url}token/v1/autentica/cartaopostagem'
             data = {'numero':self.post_card}
-            respose = requests.post(url = self.url, json= data, headers= header)
-            
-            if respose.status_code == 201:
-                respose_json = respose.json()
-                self.token = respose_json['token']
-                return {
-                'token_refresh_date' :respose_json['emissao'],
-                'token_expire_date' :respose_json['expiraEm'],
-                'token': self.token
-                }
+        elif(mode == 'contrato'):
+            data = {'numero':self.contract}
+        else:
+            data = ''
+        return url, data, header
+
+    @staticmethod
+    def _handle_token_response(respose):
+        if respose.status_code == 201:
+            return respose.json()
             
-            elif(respose.status_code == 400):
-                print('Erro de validação verifique se todas informações foram passadas corretamente')
+        elif(respose.status_code == 400):
+            print('Erro de validação verifique se todas informações foram passadas corretamente')
 
-            elif(respose.status_code == 500):
-                print('Erro no servidor , tente novamente mais tarde')
-            else:
-                print(respose.content)
-            return None
+        elif(respose.status_code == 500):
+            print('Erro no servidor , tente novamente mais tarde')
+        else:
+            print(respose.content)
+        return None
+
+    @staticmethod
+    def _flight_key(path, payload):
+        # Requisições idênticas (mesmo endpoint e mesmo conteúdo) recebem a mesma chave de agrupamento: o corpo
+        # já codificado (bytes, o mesmo enviado à API) ou os parâmetros da URL, sem uma nova serialização.
+        return (path, payload if isinstance(payload, bytes) else tuple(payload))
+
+    def _encode_payload(self, payload):
+        # Codifica o corpo uma única vez, antes do agrupamento; _request envia os bytes como estão (data=).
+        return self.json_codec.dumps(payload)
+
+    @staticmethod
+    def _bearer_token(kwargs):
+        # Token enviado na requisição, ou None se ela não usa Bearer (ex.: a própria chamada de autenticação).
+        for name, value in (kwargs.get('headers') or {}).items():
+            if name.lower() == 'authorization' and str(value).startswith('Bearer '):
+                return value[len('Bearer '):]
+        return None
+
+    @staticmethod
+    def _with_token(headers, token):
+        headers = {name: value for name, value in headers.items() if name.lower() != 'authorization'}
+        headers['Authorization'] = f'Bearer {token}'
+        return headers
+
+    @staticmethod
+    def _auth_header(token):
+
+        header = {'accept': 'application/json',
+                'Content-Type': 'application/json',
+                'Authorization': f'Bearer {token}'}
+
+
+        return header
+
+    @staticmethod
+    def _tracking_codes(*args):
+        if len(args)==1 and isinstance(args[0],(list, tuple)):
+            return args[0]
+        return args
+
+    def _iter_tracking_chunks(self, *args):
+        # Como _tracking_chunks, mas consome os códigos sob demanda (aceita também geradores).
+        if len(args)==1 and not isinstance(args[0], str):
+            tracking_codes = iter(args[0])
+        else:
+            tracking_codes = iter(args)
+        while True:
+            chunk = list(islice(tracking_codes, self.tracking_limit))
+            if not chunk:
+                return
+            yield chunk
+
+    def _tracking_chunks(self, tracking_codes):
+        # Divide os códigos em lotes de até tracking_limit, o máximo aceito por requisição.
+        limit = self.tracking_limit
+
+        if not tracking_codes:
+            return []
         
-        elif(mode == 'contrato'):
+        n_request_needed = 1
 
-            self.url = f'{self.default_url}token/v1/autentica/contrato'
-            data = {'numero':self.contract}
-            
-            respose = requests.post(url = self.url, json= data, headers= header)
-            
-            if respose.status_code == 201:
-                respose_json = respose.json()
-                self.token = respose_json['token']
-                return {
-                'token_refresh_date' :respose_json['emissao'],
-                'token_expire_date' :respose_json['expiraEm'],
-                'token': self.token
+        if len(tracking_codes) > limit:
+            n_request_needed = math.ceil(len(tracking_codes)/limit)
+
+        return [tracking_codes[limit*i:limit*(i+1)] for i in range(n_request_needed)]
+
+    def _tracking_cache_lookup(self, query_type, tracking_codes):
+        # Sem cache, todos os códigos são consultados na API.
+        if self.tracking_cache is None:
+            return {}, tracking_codes
+        return self.tracking_cache.lookup(query_type, tracking_codes)
+
+    def _tracking_cache_merge(self, query_type, tracking_codes, hits, tracking_list):
+        # Recebe só os objetos recém consultados na API, que também são gravados no tracking_store.
+        if self.tracking_store is not None and tracking_list:
+            self.tracking_store.upsert(tracking_list)
+        if self.tracking_cache is None:
+            return tracking_list
+        self.tracking_cache.store(query_type, tracking_list)
+        return self.tracking_cache.merge(tracking_codes, hits, tracking_list)
+
+    @staticmethod
+    def _tracking_params(query_type, tracking_codes):
+        return [('codigosObjetos', code) for code in tracking_codes] + [('resultado', query_type)]
+
+    @staticmethod
+    def _handle_tracking_response(response):
+        if response.status_code == 200:
+            response_json = response.json()
+                
+            return response_json.get('objetos') or []
+
+        elif response.status_code == 400:
+            print("Algo deu errado confira o Token")
+        else:
+            print("Caso ocorra algum erro no servidor. Tente novamente mais tarde")	
+        return []
+
+    @staticmethod
+    def _parse_tracking_package(package):
+        # Converte um item de 'objetos' no formato devolvido por tracking_package.
+        object ={
+                'codigo': package.get('codObjeto')
                 }
-            
-            elif(respose.status_code == 400):
-                print('Erro de validação verifique se todas informações foram passadas corretamente')
 
-            elif(respose.status_code == 500):
-                print('Erro no servidor , tente novamente mais tarde')
-            else:
-                print(respose.content)
+        if 'eventos' in package:
+            object.update({'dtPrevista': package.get('dtPrevista')})
+            dtEvent = []
+            description = []
+            place = []
+            city = []
+            uf = []
+
+            for step in package.get('eventos'):
+                dtEvent.append(step.get('dtHrCriado'))
+                description.append(step.get('descricao'))
+                place.append(step.get('unidade').get('tipo'))
+                city.append(step.get('unidade').get('endereco').get('cidade'))
+                uf.append(step.get('unidade').get('endereco').get('uf'))
+
+            object.update({
+                'dtEvent':dtEvent,
+                'description':description,
+                'local': place,
+                'cidade': city,
+                'uf': uf
+            })
+        else:
+            object.update({'description':package.get('mensagem')}) 
+
+        return object
+
+    def _tracking_updates(self, packages, state):
+        # Mantém só os eventos mais novos que o último visto (a API lista do mais recente para o mais antigo).
+        updates = []
+        markers = {}
+        for package in packages:
+            events = package.get('eventos')
+            if not events:
+                continue
+            since = state.get(package.get('codObjeto'))
+            new_events = []
+            for step in events:
+                if (step.get('dtHrCriado'), step.get('descricao')) == since:
+                    break
+                new_events.append(step)
+            if not new_events:
+                continue
+            markers[package.get('codObjeto')] = (events[0].get('dtHrCriado'), events[0].get('descricao'))
+            updates.append(self._parse_tracking_package(dict(package, eventos=new_events)))
+        state.update(markers)
+        return updates
+
+    def _build_forecast_payload(self, types, *args):
+        api_model_prazos = {
+            "idLote": "1",
+            "parametrosPrazo": self._forecast_parameters(types, *args)      
+            }
+        return api_model_prazos
+
+    def _forecast_parameters(self, types, *args):
+        # Um item de 'parametrosPrazo' por código de produto da rota.
+        # O modelo de data_defaults é copiado, nunca alterado, para que o cliente possa ser usado por várias threads.
+        template = dict(data_c.info_delivery_times)
+        param_prazos = []
 
-        elif(mode == ''):
+        template["nuRequisicao"] = '1'
+        template["dtEvento"] = args[3]
+        template["cepOrigem"] = args[0]
+        template["cepDestino"] = args[1]
+        template["dataPostagem"]= args[2]
             
-            self.url = f'{self.default_url}token/v1/autentica'
+        for prod in types:
+            param_prazos.append(dict(template, coProduto=str(prod)))
+
+        return param_prazos
+
+    def _build_forecast_lots(self, types, routes):
+        # Cada rota distinta (cepOrigem, cepDestino, dataPostagem, dtEvento) vira um item por produto.
+        items = []
+        for route in dict.fromkeys(tuple(route) for route in routes):
+            for param in self._forecast_parameters(types, *route):
+                items.append((route, param))
+        return self._pack_lots(items, "parametrosPrazo", self.forecast_lot_limit)
+
+    @staticmethod
+    def _map_forecast_lots(routes, lots, origins, responses):
+        # Devolve um dicionário rota -> itens da resposta daquela rota (None se algum lote dela falhou).
+        results = {tuple(route): [] for route in routes}
+        failed = set()
+        for route, item in _BaseClientCorreios._iter_lot_results(lots, origins, responses, "parametrosPrazo", failed):
+            results[route].append(item)
+        return {route: None if route in failed else result for route, result in results.items()}
+
+    @staticmethod
+    def _handle_forecast_response(response):
+        if response.status_code == 200:
+            response_json = response.json()
+            return(response_json)
+        else:
+            print(response.text)
+            return None
+
+    @staticmethod
+    def _price_data(*args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], dict):
+            # Se houver apenas um argumento e for um dicionário, podemos assumir que são os dados
+            dados = args[0]
             
-            respose = requests.post(url = self.url, json= '', headers= header)
+        elif len(args) == 0:
+            # Se não houver argumentos posicionais, podemos usar os kwargs diretamente
+            dados = kwargs
+
+        else:
+            # Se não atendermos às condições anteriores, há algo errado com os argumentos
+            raise ValueError("Argumentos inválidos. Você deve fornecer uma lista, dicionário ou usar argumentos de palavras-chave.")
+        return dados
+
+    def _build_price_payload(self, dados):
+        api_model_precos = {
+            "idLote": "1",
+            "parametrosProduto": self._price_parameters(dados)    
+            }
+        return api_model_precos
+
+    def _price_parameters(self, dados):
+        # Um item de 'parametrosProduto' por código de produto do pacote.
+        # Nem dados nem o modelo de data_defaults são alterados: cada chamada monta a sua própria cópia.
+        template = dict(data_c.info_get_price)
+        serv, adcs_serv = [dados.get(x) or [] for x in ('coProduto', 'servicosAdicionais')]
+        self.service_catalog.validate(serv, adcs_serv)
+        template.update({k: v for k, v in dados.items() if k not in ('coProduto', 'servicosAdicionais')})
+        template.update({'nuContrato': self.contract,'nuDR': self.nuDR })
+
+        if not 'VD' in adcs_serv :
+            template.pop('vlDeclarado', None)
+        
+        param_prices = []
+
+        for prod in serv:
+            adicionais = self.service_catalog.additional_codes(prod, adcs_serv)
+            param_prices.append(dict(template, coProduto=str(prod), servicosAdicionais=adicionais))
+
+        return param_prices
+
+    def _build_price_lots(self, shipments):
+        # Distribui os itens de todos os pacotes em lotes de até price_lot_limit, cada item com um nuRequisicao
+        # único. Retorna os lotes e, para cada lote, a posição do pacote de origem de cada item.
+        items = []
+        for index, shipment in enumerate(shipments):
+            for param in self._price_parameters(shipment):
+                items.append((index, param))
+        return self._pack_lots(items, "parametrosProduto", self.price_lot_limit)
+
+    @staticmethod
+    def _map_price_lots(n_shipments, lots, origins, responses):
+        # Devolve, para cada pacote, a lista de preços no formato de price_package (None se algum lote dele falhou).
+        results = [[] for _ in range(n_shipments)]
+        failed = set()
+        for index, r in _BaseClientCorreios._iter_lot_results(lots, origins, responses, "parametrosProduto", failed):
+            results[index].append({'coProduto': r.get('coProduto'), 'preco': r.get('pcFinal')})
+        return [None if index in failed else result for index, result in enumerate(results)]
+
+    @staticmethod
+    def _pack_lots(items, list_key, limit):
+        # Numera os itens (origem, parâmetro) com nuRequisicao únicos e os distribui em lotes de até limit itens.
+        # Retorna os lotes e, para cada lote, o mapa nuRequisicao -> origem.
+        lots = []
+        origins = []
+        for start in range(0, len(items), limit):
+            lot = items[start:start + limit]
+            for position, (_, param) in enumerate(lot):
+                param['nuRequisicao'] = str(start + position + 1)
+            lots.append({
+                "idLote": str(len(lots) + 1),
+                list_key: [param for _, param in lot]
+                })
+            origins.append({param['nuRequisicao']: origin for origin, param in lot})
+        return lots, origins
+
+    @staticmethod
+    def _iter_lot_results(lots, origins, responses, list_key, failed):
+        # Percorre as respostas dos lotes devolvendo (origem, item); origens de lotes que falharam vão para failed.
+        for lot, origin, response in zip(lots, origins, responses):
+            if response is None:
+                failed.update(origin.values())
+                continue
+            params = lot[list_key]
+            for position, item in enumerate(response):
+                nu_requisicao = item.get('nuRequisicao') or params[position]['nuRequisicao']
+                yield origin[str(nu_requisicao)], item
+
+    def _quote_cache_lookup(self, dados):
+        # Retorna os preços já em cache e os produtos que ainda precisam ser cotados na API.
+        products = list(dados.get('coProduto') or [])
+        if self.quote_cache is None:
+            return {}, products
+        return self.quote_cache.lookup(self._quote_key_data(dados))
+
+    def _quote_cache_merge(self, dados, hits, resposta):
+        if self.quote_cache is None or resposta is None:
+            return resposta
+        key_data = self._quote_key_data(dados)
+        self.quote_cache.store(key_data, resposta)
+        return self.quote_cache.merge(key_data.get('coProduto') or [], hits, resposta)
+
+    def _quote_key_data(self, dados):
+        # O contrato e a DR também determinam o preço, então entram na chave do cache.
+        return dict(dados, nuContrato=self.contract, nuDR=self.nuDR)
+
+    @staticmethod
+    def _handle_price_lot_response(response):
+        if response.status_code == 200:
+            return response.json()
+        print(response.text)
+        return None
+
+    @staticmethod
+    def _handle_price_response(response):
+        if response.status_code == 200:
+            resposta =[{'coProduto': r.get('coProduto'), 'preco': r.get('pcFinal')} for r in response.json()]
             
-            if respose.status_code == 201:
-                respose_json = respose.json()
-                self.token = respose_json['token']
-                return {
-                'token_refresh_date' :respose_json['emissao'],
-                'token_expire_date' :respose_json['expiraEm'],
-                'token': self.token
-                }
+            return(resposta)
+        else:
+            print(response.text)
+            return None
+
+    def _build_pre_post_payload(self, *args, **kwargs):
+        if len(args)==1 and isinstance(args[0], dict):
+            dados = args[0]
+        else:
+            dados = kwargs
+
+        servico = dados.get('servico')
+        adcs_serv = dados.get('codigosServicosAdicionais') or []
+        self.service_catalog.validate([servico], adcs_serv)
+
+        serv_adc =[]
+        for adc_serv in adcs_serv:
+            codigo = self.service_catalog.additional_code(servico, adc_serv)
+
+            if adc_serv== 'VD' and dados.get("valorDeclarado")!= None:
+                serv_adc.append({"codigoServicoAdicional":codigo,
+                                 "valorDeclarado": dados.get('valorDeclarado')})
+
+            elif adc_serv=='EV' and dados.get('orientacaoEntregaVizinho') != None:
+                serv_adc.append({"codigoServicoAdicional":codigo,
+                                 "orientacaoEntregaVizinho":dados.get('orientacaoEntregaVizinho')})
+            else:
+                serv_adc.append({"codigoServicoAdicional":codigo})
+
+        template = dict(data_c.pre_postagem)
+        template.update({'destinatario': dados.get('destinatario'), 
+                         'remetente': dados.get('remetente'), 
+                         'codigoServico':dados.get('servico'),
+                         'numeroNotaFiscal': dados.get('nNFe'),
+                         'chaveNFe':dados.get('chNfe'),
+                         'numeroCartaoPostagem': self.post_card,
+                         'listaServicoAdicional':serv_adc,
+                         'pesoInformado':dados.get('pesoInformado'),
+                         'alturaInformada': dados.get('altura'),
+                         'larguraInformada': dados.get('largura'),
+                         'comprimentoInformado': dados.get('comprimento'),
+                         'solicitarColeta': dados.get('coleta'),
+                         'dataPrevistaPostagem':dados.get('dataPrevistaPostagem'),
+                         'modalidadePagamento': dados.get('pagamento'),
+                         'logisticaReversa': dados.get('reversa')
+                        } 
+                        )
+        return template
+
+    @staticmethod
+    def _handle_pre_post_response(response):
+        if response.status_code in _BaseClientCorreios.pre_post_ok_status:
+            body = response.json()
+            resposta ={x: body.get(x) for x in ('id', 'codigoServico', 'numeroNotaFiscal', 'codigoObjeto', 'dataHora')}
+
             
-            elif(respose.status_code == 400):
-                print('Erro de validação verifique se todas informações foram passadas corretamente')
+            return(resposta)
+        else:
+            print(response.text)
+            return None
+
+    def _pre_post_pending(self, dados):
+        # Retorna (chave, resultado já registrado ou None, payload a enviar). Erros de validação viram falha do item.
+        key = idempotency_key(dados)
+        resposta = self.pre_post_registry.get(key)
+        if resposta is not None:
+            return key, self._pre_post_success(key, resposta, reaproveitado=True), None
+        try:
+            with self._span('build', 'prepostagem'):
+                return key, None, self._build_pre_post_payload(dados)
+        except ValueError as error:
+            return key, self._pre_post_failure(key, str(error)), None
+
+    def _pre_post_duplicate(self, dados, index, seen):
+        # Itens sem chave recebem uma gerada; um item cuja chave já apareceu no mesmo lote não é enviado e vira
+        # falha que aponta o primeiro.
+        key = assign_idempotency_key(dados)
+        if key in seen:
+            return self._pre_post_failure(key, f'Chave de idempotência repetida no lote (mesma do item {seen[key]}).')
+        seen[key] = index
+        return None
+
+    def _pre_post_outcome(self, key, response):
+        # Converte a resposta da API no resultado do item, guardando no registro as pré-postagens aceitas.
+        if response.status_code in self.pre_post_ok_status:
+            with self._span('parse', 'prepostagem'):
+                body = response.json()
+            resposta = {x: body.get(x) for x in ('id', 'codigoServico', 'numeroNotaFiscal', 'codigoObjeto', 'dataHora')}
+            self.pre_post_registry.set(key, resposta)
+            return self._pre_post_success(key, resposta)
+        try:
+            erro = response.json()
+        except ValueError:
+            erro = response.text
+        return self._pre_post_failure(key, erro, response.status_code)
+
+    @staticmethod
+    def _pre_post_success(key, resposta, reaproveitado=False):
+        return {'chaveIdempotencia': key, 'sucesso': True, 'codigoObjeto': resposta.get('codigoObjeto'),
+                'resposta': resposta, 'erro': None, 'status': None, 'reaproveitado': reaproveitado}
+
+    @staticmethod
+    def _pre_post_failure(key, erro, status=None):
+        return {'chaveIdempotencia': key, 'sucesso': False, 'codigoObjeto': None,
+                'resposta': None, 'erro': erro, 'status': status, 'reaproveitado': False}
+
+class ApiClientCorreios(_BaseClientCorreios):
+    def __init__(self, user, acess_code, post_card, contract, token, nuDR,
+                 session=None, pool_connections=10, pool_maxsize=10, timeout=DEFAULT_TIMEOUT,
+                 token_mode='cartao_postagem', token_manager=None, token_store=None, tracking_cache=None,
+                 quote_cache=None, coalesce_requests=True, service_catalog=None, pre_post_registry=None,
+                 rate_limiter=None, retry_policy=DEFAULT_RETRY_POLICY, circuit_breaker=True,
+                 metrics=None, json_codec=None, tracking_store=None):
+        """
+        Args:
+            session (requests.Session, opcional): Transporte HTTP a ser usado por todos os endpoints.
+                Se não for informado, o cliente cria (e passa a ser dono de) uma sessão com pool de conexões.
+            pool_connections (int): Quantidade de pools (hosts) mantidos pela sessão criada pelo cliente.
+            pool_maxsize (int): Conexões keep-alive mantidas por host na sessão criada pelo cliente.
+            timeout (float ou tuple): Timeout repassado a cada requisição: (conexão, leitura) em segundos, ou um
+                único valor para os dois. Padrão DEFAULT_TIMEOUT, (5, 30). None espera indefinidamente.
+            token_mode (str): Modo de autenticação usado nas chamadas aos endpoints (ver refresh_token).
+            token_manager (TokenManager, opcional): Gerenciador de tokens; por padrão renova 5 minutos antes de expirar.
+            token_store (FileTokenStore, opcional): Cache de tokens compartilhado entre processos do mesmo host.
+            tracking_cache (TrackingCache, opcional): Cache dos resultados de tracking_package; com ele,
+                apenas os códigos ausentes ou vencidos no cache são consultados na API.
+            quote_cache (QuoteCache, opcional): Cache das cotações de price_package, por produto.
+            coalesce_requests (bool): Se True, consultas idênticas de price_package, delivery_forecast e
+                tracking_package feitas ao mesmo tempo por várias threads geram uma única requisição,
+                cujo resultado é entregue a todas elas.
+            service_catalog (ServiceCatalog, opcional): Catálogo de produtos e serviços adicionais usado para
+                montar e validar as cotações e pré-postagens. Padrão é o catálogo de data_defaults.servicos.
+            pre_post_registry (FilePrePostRegistry, opcional): Registro das pré-postagens já aceitas, por chave
+                de idempotência, usado por pre_post_obj_reg_bulk. Padrão é um registro em memória.
+            rate_limiter (RateLimiter, opcional): Limite de requisições por segundo por endpoint, que pode ser
+                compartilhado entre clientes e threads; respostas 429 reduzem o ritmo do endpoint.
+            retry_policy (RetryPolicy, opcional): Novas tentativas com backoff exponencial e jitter para erros
+                5xx, timeouts e 429. A pré-postagem, que não é idempotente, só é repetida em 429. None desativa.
+            circuit_breaker (CircuitBreakers ou bool): Disjuntor por endpoint; enquanto um endpoint está fora do
+                ar as chamadas falham na hora com status 503, sem ocupar threads em timeouts. True (padrão) cria
+                um para o cliente, None/False desativa, e uma instância pode ser compartilhada entre clientes.
+            metrics (ClientMetrics, opcional): Contadores, histogramas de latência e bytes por endpoint, com
+                ganchos para cada fase (token, montagem do payload, rede e leitura da resposta).
+            json_codec (opcional): Codec JSON dos corpos enviados e recebidos (ver json_codec.py). Padrão é o
+                orjson, se instalado, ou o módulo json. Cada resposta é decodificada uma única vez.
+            tracking_store (SQLiteTrackingStore, opcional): Banco local onde são gravados os objetos e eventos
+                consultados por tracking_package, tracking_package_iter e tracking_table.
+        """
+        super().__init__(user, acess_code, post_card, contract, token, nuDR, timeout=timeout,
+                         token_mode=token_mode, token_manager=token_manager, token_store=token_store,
+                         tracking_cache=tracking_cache, quote_cache=quote_cache,
+                         coalesce_requests=coalesce_requests, service_catalog=service_catalog,
+                         pre_post_registry=pre_post_registry, rate_limiter=rate_limiter,
+                         retry_policy=retry_policy, circuit_breaker=circuit_breaker, metrics=metrics,
+                         json_codec=json_codec, tracking_store=tracking_store)
+        self.inflight = SingleFlight()
+        self._owns_session = session is None
+        self.session = session if session is not None else self.build_session(pool_connections, pool_maxsize)
+
+    @staticmethod
+    def build_session(pool_connections=10, pool_maxsize=10):
+        """
+        Cria uma sessão HTTP com pool de conexões keep-alive, reaproveitando
+        as conexões TCP+TLS com api.correios.com.br entre as chamadas.
+
+        Args:
+            pool_connections (int): Quantidade de hosts com pool mantido.
+            pool_maxsize (int): Conexões mantidas por host.
 
-            elif(respose.status_code == 500):
-                print('Erro no servidor , tente novamente mais tarde')
+        Returns:
+            requests.Session: Sessão pronta para ser usada pelo cliente.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Connection': 'keep-alive'})
+        return session
+
+    def _request(self, method, url, retry=True, **kwargs):
+        # Todo acesso HTTP dos endpoints passa por aqui: disjuntor, novas tentativas e limite de ritmo.
+        # Com retry=False a chamada é feita uma única vez (sem as novas tentativas da retry_policy nem a repetição
+        # após 401), para quem conta cada requisição, como o TrackingPoller.
+        if self.timeout is not None:
+            kwargs.setdefault('timeout', self.timeout)
+        endpoint = self._endpoint(url)
+        kwargs = self._encode_body(endpoint, kwargs)
+        response = self._attempts(endpoint, method, url, kwargs, retry)
+        token = self._bearer_token(kwargs)
+        if response.status_code != 401 or token is None:
+            return response
+        # Token recusado antes de 'expiraEm' (revogado ou vencido): autentica de novo e repete uma única vez.
+        self.tokens.invalidate(self.token_mode, token)
+        if not retry:
+            return response
+        fresh = self.current_token()
+        if not fresh or fresh == token:
+            return response
+        kwargs['headers'] = self._with_token(kwargs['headers'], fresh)
+        return self._attempts(endpoint, method, url, kwargs)
+
+    def _attempts(self, endpoint, method, url, kwargs, retry=True):
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                if self.metrics is not None:
+                    self.metrics.record_circuit_open(endpoint)
+                return CircuitOpenResponse(endpoint, breaker.retry_in())
+            if attempt and self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            attempt += 1
+            try:
+                response = self._send(endpoint, method, url, **kwargs)
+            except requests.RequestException:
+                self._record_outcome(breaker, None)
+                delay = self._retry_delay(endpoint, attempt) if retry else None
+                if delay is None:
+                    raise
             else:
-                print(respose.content)
-        
+                self._record_outcome(breaker, response.status_code)
+                delay = self._retry_delay(endpoint, attempt, response) if retry else None
+                if delay is None:
+                    return response
+            time.sleep(delay)
+
+    def _send(self, endpoint, method, url, **kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(endpoint)
+        if self.metrics is None:
+            response = self._read(self.session.request(method, url, **kwargs))
         else:
-            raise ValueError("Modo de autenticação não reconhecido.")
+            start = time.perf_counter()
+            with self._span('network', endpoint):
+                try:
+                    response = self._read(self.session.request(method, url, **kwargs))
+                except requests.RequestException:
+                    self._record_request(endpoint, method, None, start)
+                    raise
+            self._record_request(endpoint, method, response, start, kwargs.get('data'))
+        if self.rate_limiter is not None:
+            self.rate_limiter.feedback(endpoint, response.status_code, response.headers)
+        return response
+
+    def _read(self, response):
+        return CodecResponse(response.status_code, response.content, response.headers, self.json_codec)
+
+    def _coalesce(self, key, fn):
+        # Agrupa chamadas idênticas em andamento (ver coalesce_requests).
+        if not self.coalesce_requests:
+            return fn()
+        return self.inflight.do(key, fn)
+
+    def close(self):
+        """
+        Fecha o transporte HTTP, liberando as conexões do pool.
+        Uma sessão recebida de fora (parâmetro session) não é fechada, pois pertence a quem a criou.
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
-    def header(self):
 
-        header = {'accept': 'application/json',
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.token}'}
+    def refresh_token(self, mode='cartao_postagem'):
+        """
+        Atualiza o token de autenticação para acesso a recursos específicos da API dos Correios.
 
+        A renovação passa pelo gerenciador de tokens do cliente (self.tokens): cada modo guarda o seu
+        próprio token e chamadas simultâneas para o mesmo modo resultam em uma única autenticação.
 
-        return header 
+        Args:
+            mode (str): O modo de autenticação. Padrão é 'cartao_postagem'.
+            - cartao_postagem :  Token para as APIs : 27,34,35,36,37,41,76,78,80,83,87,93,566,587
+            - contrato : Token permite acessa  27,34,35,41,76,78,87,566,587
+            - '' (vazio)
+            
+
+        Returns:
+            dict: Um dicionário contendo informações sobre o token atualizado. 
+                As chaves são 'token_refresh_date', 'token_expire_date' e 'token'.
+                Retorna None em caso de erro.
+
+        Raises:
+            ValueError: Se o modo de autenticação não for reconhecido.
+        """
+
+        if mode not in self.token_paths:
+            raise ValueError("Modo de autenticação não reconhecido.")
+
+        entry = self.tokens.refresh(mode, lambda: self._fetch_token(mode))
+        if entry is not None:
+            # Como antes, o último modo renovado passa a ser o usado pelos endpoints.
+            self.token_mode = mode
+        return self._token_info(mode, entry)
+
+    def _fetch_token(self, mode):
+        # Faz a chamada de autenticação propriamente dita; o controle de validade fica com self.tokens.
+        with self._span('token', 'token'):
+            url, data, header = self._token_request(mode)
+            respose = self._request('POST', url, json= data, headers= header)
+            return self._handle('token', self._handle_token_response, respose)
+
+    def current_token(self, mode=None):
+        """
+        Retorna um token válido para o modo informado (padrão: self.token_mode).
+
+        O token é renovado automaticamente pouco antes de 'expiraEm'. Um token informado no construtor,
+        sem validade conhecida, é usado até que a API responda 401; nesse caso ele é descartado e o cliente
+        autentica de novo.
+        """
+        mode = self.token_mode if mode is None else mode
+        entry = self.tokens.token(mode, lambda: self._fetch_token(mode))
+        if entry is None:
+            return self.token
+        if mode == self.token_mode:
+            self.token = entry['token']
+        return entry['token']
+        
+    def header(self):
+
+        return self._auth_header(self.current_token())
         
-    def tracking_package(self, query_type, *args):
+    def tracking_package(self, query_type, *args, max_workers=None):
         
         """
         Realiza o rastreamento de pacotes de acordo com o tipo de consulta especificado.
@@ -144,6 +830,12 @@ class ApiClientCorreios:
 
             *args (list or tuple): Uma lista ou tupla contendo os códigos de rastreamento dos pacotes.
 
+            max_workers (int, opcional): Quantidade máxima de lotes de 50 códigos consultados em paralelo.
+            Se não for informado, os lotes são consultados um após o outro.
+
+            Com tracking_cache configurado, os códigos já em cache não são consultados e o resultado
+            segue a ordem dos códigos informados.
+
         Returns:
             list: Uma lista de dicionários contendo informações sobre o rastreamento de cada pacote. Cada dicionário possui as seguintes chaves:
             - 'codigo': O código de rastreamento do pacote.
@@ -170,79 +862,128 @@ class ApiClientCorreios:
             >>> tracker = ApiClientCorreios(args)
             >>> result = tracker.tracking_package('U', ('AA000000000BR', 'AA000000001BR'))
             >>> print(result)
+
+            Para consultar uma lista grande com até 8 lotes simultâneos:
+
+            >>> result = tracker.tracking_package('T', codigos, max_workers=8)
         """
         
-        self.url = f'{self.default_url}srorastro/v1/objetos'
-        limit = 50
-    
-        if len(args)==1 and isinstance(args[0],(list, tuple)):
-            tracking_codes = args[0]
-        else:
-            tracking_codes = args
-        
-        n_request_needed = 1
+        tracking_codes = self._tracking_codes(*args)
+        hits, missing_codes = self._tracking_cache_lookup(query_type, tracking_codes)
+        packages = self._fetch_tracking_packages(query_type, missing_codes, max_workers)
 
-        if len(tracking_codes) > limit:
-            n_request_needed = math.ceil(len(tracking_codes)/limit)
+        with self._span('parse', 'srorastro'):
+            tracking_list = [self._parse_tracking_package(package) for package in packages]
+        return self._tracking_cache_merge(query_type, tracking_codes, hits, tracking_list)
 
-        packages =[]
-        
-        for i in range(n_request_needed):
+    def tracking_package_iter(self, query_type, *args, max_workers=None):
+        """
+        Versão em gerador de tracking_package: devolve os objetos lote a lote, à medida que as respostas chegam.
 
-            
-            params ={'codigosObjetos': tracking_codes[limit*i:limit*(i+1)],
-                    'resultado': query_type}
-            
-            
-            response = requests.get(self.url,params= params, headers= self.header() )
-            if response.status_code == 200:
-                response_json = response.json()
-                
-                packages.extend(response_json.get('objetos'))
-            
-            
+        Os códigos são lidos sob demanda (podem vir de um gerador) e no máximo max_workers lotes ficam em
+        andamento ao mesmo tempo, então o uso de memória não cresce com a quantidade de códigos.
+        A ordem de entrada é mantida e o tracking_cache, se configurado, é respeitado.
 
-            elif response.status_code == 400:
-                print("Algo deu errado confira o Token")
-            else:
-                print("Caso ocorra algum erro no servidor. Tente novamente mais tarde")	
+        Args:
+            query_type (str): 'U', 'T' ou 'P', como em tracking_package.
+            *args: Os códigos de rastreamento, soltos ou em um único iterável.
+            max_workers (int, opcional): Quantidade máxima de lotes de 50 códigos consultados em paralelo.
 
-        tracking_list = []
+        Yields:
+            dict: Um objeto por código, no formato de tracking_package.
 
-        for package in packages:
-            object ={
-                    'codigo': package.get('codObjeto')
-                    }
+        Exemplo:
+            >>> for objeto in correios.tracking_package_iter('U', ler_codigos(), max_workers=8):
+            ...     gravar(objeto)
+        """
+        chunks = self._iter_tracking_chunks(*args)
+
+        if max_workers is None or max_workers <= 1:
+            for chunk in chunks:
+                yield from self._tracking_chunk_objects(query_type, chunk)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(self._tracking_chunk_objects, query_type, chunk))
+                if len(pending) >= max_workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _tracking_chunk_objects(self, query_type, tracking_codes):
+        # Consulta e converte um lote de códigos, usando o tracking_cache quando configurado.
+        hits, missing_codes = self._tracking_cache_lookup(query_type, tracking_codes)
+        packages = self._fetch_tracking_chunk(query_type, missing_codes) if missing_codes else []
+        with self._span('parse', 'srorastro'):
+            tracking_list = [self._parse_tracking_package(package) for package in packages]
+        return self._tracking_cache_merge(query_type, tracking_codes, hits, tracking_list)
+
+    def tracking_table(self, query_type, *args, max_workers=None):
+        """
+        Rastreia os códigos e devolve o resultado em uma TrackingTable (formato colunar compacto),
+        sem manter a lista de dicionários de tracking_package em memória.
 
-            if 'eventos' in package:
-                object.update({'dtPrevista': package.get('dtPrevista')})
-                dtEvent = []
-                description = []
-                place = []
-                city = []
-                uf = []
-
-                for step in package.get('eventos'):
-                    dtEvent.append(step.get('dtHrCriado'))
-                    description.append(step.get('descricao'))
-                    place.append(step.get('unidade').get('tipo'))
-                    city.append(step.get('unidade').get('endereco').get('cidade'))
-                    uf.append(step.get('unidade').get('endereco').get('uf'))
-
-                object.update({
-                    'dtEvent':dtEvent,
-                    'description':description,
-                    'local': place,
-                    'cidade': city,
-                    'uf': uf
-                })
-            else:
-                object.update({description:package.get('mensagem')}) 
+        Args:
+            query_type, *args, max_workers: Como em tracking_package_iter.
 
-            tracking_list.append(object)  
+        Returns:
+            TrackingTable: Tabela com os objetos e eventos, exportável para NumPy, pandas ou Arrow.
+        """
+        return TrackingTable.from_tracking(self.tracking_package_iter(query_type, *args, max_workers=max_workers))
 
-        return tracking_list
-                
+    def tracking_updates(self, *args, state=None, max_workers=None):
+        """
+        Rastreamento incremental: retorna apenas os eventos ocorridos desde a última consulta de cada código.
+
+        Os objetos são consultados com query_type 'T' e o último evento visto de cada código
+        (dtHrCriado + descrição) fica guardado no estado. Apenas os eventos mais novos que ele são
+        convertidos e devolvidos; códigos sem novidades não aparecem no resultado.
+
+        Args:
+            *args (list or tuple): Os códigos de rastreamento, como em tracking_package.
+            state (MemoryTrackingState or FileTrackingState, opcional): Onde guardar o último evento visto.
+                Se não for informado, usa o estado em memória do cliente (self.tracking_state).
+            max_workers (int, opcional): Lotes de 50 códigos consultados em paralelo, como em tracking_package.
+
+        Returns:
+            list: Dicionários no formato de tracking_package, contendo somente os eventos novos.
+
+        Exemplo:
+            >>> estado = FileTrackingState('rastreio.json')
+            >>> novidades = correios.tracking_updates(codigos, state=estado)
+        """
+        state = self.tracking_state if state is None else state
+        tracking_codes = self._tracking_codes(*args)
+        packages = self._fetch_tracking_packages('T', tracking_codes, max_workers)
+        return self._tracking_updates(packages, state)
+
+    def _fetch_tracking_packages(self, query_type, tracking_codes, max_workers=None):
+        # Consulta os códigos em lotes e devolve os itens de 'objetos' ainda sem conversão, na ordem de entrada.
+        chunks = self._tracking_chunks(tracking_codes)
+
+        if max_workers is not None and max_workers > 1 and len(chunks) > 1:
+            # O map do executor devolve os resultados na ordem dos lotes, preservando a ordem de entrada.
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+                results = list(executor.map(lambda chunk: self._fetch_tracking_chunk(query_type, chunk), chunks))
+        else:
+            results = [self._fetch_tracking_chunk(query_type, chunk) for chunk in chunks]
+
+        packages =[]
+        for result in results:
+            packages.extend(result)
+        return packages
+
+    def _fetch_tracking_chunk(self, query_type, tracking_codes):
+        # Consulta um lote de códigos e devolve a lista 'objetos' da resposta (vazia em caso de erro).
+        params = self._tracking_params(query_type, tracking_codes)
+
+        def fetch():
+            response = self._request('GET', f'{self.default_url}srorastro/v1/objetos', params= params, headers= self.header())
+            return self._handle('srorastro', self._handle_tracking_response, response)
+
+        return self._coalesce(self._flight_key('srorastro/v1/objetos', params), fetch)
 
     def delivery_forecast(self, types, *args):
 
@@ -279,35 +1020,46 @@ class ApiClientCorreios:
                 print("Falha ao obter previsão de entrega.")
         """
 
-        self.url = f'{self.default_url}prazo/v1/nacional'
+        with self._span('build', 'prazo'):
+            body = self._encode_payload(self._build_forecast_payload(types, *args))
+
+        def post():
+            response = self._request('POST', f'{self.default_url}prazo/v1/nacional', data = body, headers= self.header())
+            return self._handle('prazo', self._handle_forecast_response, response)
+
+        return self._coalesce(self._flight_key('prazo/v1/nacional', body), post)
         
-        template = data_c.info_delivery_times
-        param_prazos = []
+    def delivery_forecast_bulk(self, types, routes, max_workers=None):
+        """
+        Consulta a previsão de entrega de várias rotas de uma vez, agrupando-as em lotes de prazo/v1/nacional.
 
-        template["nuRequisicao"] = '1'
-        template["dtEvento"] = args[3]
-        template["cepOrigem"] = args[0]
-        template["cepDestino"] = args[1]
-        template["dataPostagem"]= args[2]
-            
-        for prod in types:
-            template["coProduto"] = str(prod)
-            param_prazos.append(template.copy())
+        Cada item recebe um nuRequisicao único, rotas repetidas são consultadas uma única vez, os lotes são
+        divididos no limite da API (forecast_lot_limit itens) e enviados em paralelo.
 
-        api_model_prazos = {
-            "idLote": "1",
-            "parametrosPrazo": param_prazos      
-            }
+        Args:
+            types (list): Códigos dos produtos, como em delivery_forecast.
+            routes (list): Lista de tuplas (cepOrigem, cepDestino, dataPostagem, dtEvento).
+            max_workers (int, opcional): Quantidade máxima de lotes enviados ao mesmo tempo.
 
+        Returns:
+            dict: Para cada rota (como tupla), a lista de itens devolvidos pela API para ela
+                (um por produto), ou None se o lote da rota não pôde ser consultado.
+
+        Exemplo:
+            >>> rotas = [('33110580', '33145160', '05/04/2024', '05/04/2024'),
+            ...          ('01000000', '04000000', '05/04/2024', '05/04/2024')]
+            >>> prazos = correios.delivery_forecast_bulk(['03220', '03298'], rotas, max_workers=4)
+            >>> prazos[rotas[0]]
+        """
+        with self._span('build', 'prazo'):
+            lots, origins = self._build_forecast_lots(types, routes)
+        responses = self._send_lots(lots, self._post_forecast_lot, max_workers)
+        return self._map_forecast_lots(routes, lots, origins, responses)
+
+    def _post_forecast_lot(self, lot):
+        response = self._request('POST', f'{self.default_url}prazo/v1/nacional', json = lot, headers= self.header())
+        return self._handle('prazo', self._handle_forecast_response, response)
 
-        response = requests.post(self.url, json = api_model_prazos, headers= self.header() )
-        if response.status_code == 200:
-            response_json = response.json()
-            return(response_json)
-        else:
-            print(response.text)
-            return None
-        
     def price_package(self, *args, **kwargs):
 
         """
@@ -338,65 +1090,63 @@ class ApiClientCorreios:
             - cepDestino (str): CEP de destino do pacote.
             - servicosAdicionais (lista): Lista de códigos de serviços adicionais.
 
-            """
-        
-        if len(args) == 1 and isinstance(args[0], dict):
-            # Se houver apenas um argumento e for um dicionário, podemos assumir que são os dados
-            dados = args[0]
-            
-        elif len(args) == 0:
-            # Se não houver argumentos posicionais, podemos usar os kwargs diretamente
-            dados = kwargs
-
-        else:
-            # Se não atendermos às condições anteriores, há algo errado com os argumentos
-            raise ValueError("Argumentos inválidos. Você deve fornecer uma lista, dicionário ou usar argumentos de palavras-chave.")
-
-        dados.update({'nuContrato': self.contract,'nuDR': self.nuDR })
+            Com quote_cache configurado, apenas os produtos sem preço em cache são enviados à API.
 
+            """
 
-        self.url = f'{self.default_url}preco/v1/nacional'
-            
-        template = data_c.info_get_price
-        serv, adcs_serv = [dados.pop(x) for x in ('coProduto', 'servicosAdicionais')]
-        servicos = data_c.servicos
-        template.update(dados)
+        dados = self._price_data(*args, **kwargs)
+        hits, missing = self._quote_cache_lookup(dados)
+        if not missing:
+            return self._quote_cache_merge(dados, hits, [])
 
-        if not 'VD' in adcs_serv :
-            template.pop('vlDeclarado')
-        
-        param_prices = []
+        with self._span('build', 'preco'):
+            body = self._encode_payload(self._build_price_payload(dict(dados, coProduto=missing)))
 
-        for prod in serv:
+        def post():
+            response = self._request('POST', f'{self.default_url}preco/v1/nacional', data = body, headers= self.header())
+            return self._handle('preco', self._handle_price_response, response)
 
-            template['coProduto'] = str(prod)
-            for service in servicos:
+        resposta = self._coalesce(self._flight_key('preco/v1/nacional', body), post)
+        return self._quote_cache_merge(dados, hits, resposta)
 
-                if service['cod'] == prod: 
+    def price_package_bulk(self, shipments, max_workers=None):
+        """
+        Cota o preço de vários pacotes de uma vez, agrupando-os em lotes de preco/v1/nacional.
 
-                    template['servicosAdicionais'] =[service['servicos_adicionais'].get(adc_serv) for adc_serv in adcs_serv]
+        Cada item recebe um nuRequisicao único, os lotes são divididos automaticamente no limite da API
+        (price_lot_limit itens) e enviados em paralelo; cada pcFinal é devolvido ao pacote de origem.
 
-                    param_prices.append(template.copy())
-                    
-                    break
-            
+        Args:
+            shipments (list): Lista de dicionários no formato aceito por price_package
+                (coProduto, cepOrigem, cepDestino, psObjeto, ..., servicosAdicionais).
+            max_workers (int, opcional): Quantidade máxima de lotes enviados ao mesmo tempo.
+                Se não for informado, os lotes são enviados um após o outro.
 
-        api_model_precos = {
-            "idLote": "1",
-            "parametrosProduto": param_prices    
-            }
+        Returns:
+            list: Um item por pacote, na ordem de entrada: a lista de {'coProduto', 'preco'} como em
+                price_package, ou None se o lote do pacote não pôde ser cotado.
 
-        response = requests.post(self.url, json = api_model_precos, headers= self.header())
+        Exemplo:
+            >>> precos = correios.price_package_bulk([pacote1, pacote2, pacote3], max_workers=4)
+            >>> precos[1]
+            [{'coProduto': '03220', 'preco': '25,10'}, {'coProduto': '03298', 'preco': '19,80'}]
+        """
+        with self._span('build', 'preco'):
+            lots, origins = self._build_price_lots(shipments)
+        responses = self._send_lots(lots, self._post_price_lot, max_workers)
+        return self._map_price_lots(len(shipments), lots, origins, responses)
+
+    def _post_price_lot(self, lot):
+        response = self._request('POST', f'{self.default_url}preco/v1/nacional', json = lot, headers= self.header())
+        return self._handle('preco', self._handle_price_lot_response, response)
+
+    def _send_lots(self, lots, post, max_workers=None):
+        # Envia os lotes (em paralelo, se max_workers > 1) e devolve as respostas na ordem dos lotes.
+        if max_workers is not None and max_workers > 1 and len(lots) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(lots))) as executor:
+                return list(executor.map(post, lots))
+        return [post(lot) for lot in lots]
 
-        if response.status_code == 200:
-            resposta =[{'coProduto': r.get('coProduto'), 'preco': r.get('pcFinal')} for r in response.json()]
-            
-            return(resposta)
-        else:
-            print(response.text)
-            return None
-        
-        
     def pre_post_obj_reg(self, *args, **kwargs):
 
         """Função pre_post_obj_reg
@@ -459,73 +1209,89 @@ class ApiClientCorreios:
         correios.pre_post_obj_reg(dados_pre_postagem)
     """
 
-        if len(args)==1 and isinstance(args[0], dict):
-            dados = args[0]
-        else:
-            dados = kwargs
-
-        self.url = f'{self.default_url}prepostagem/v1/prepostagens'
-        servicos_adc = data_c.servicos
-        for service in servicos_adc:
-
-            if service['cod'] == dados.get('servico'): 
-                serv_adc =[]
-                for adc_serv in dados.get('codigosServicosAdicionais'):
-
-                    if adc_serv== 'VD' and dados.get("valorDeclarado")!= None:
-                    
-                        serv_adc.append({"codigoServicoAdicional":service['servicos_adicionais'].get(adc_serv),
-                                         "valorDeclarado": dados.get('valorDeclarado')})
-                        
-                    elif adc_serv=='EV' and dados.get('orientacaoEntregaVizinho') != None:
-                        serv_adc.append({"codigoServicoAdicional":service['servicos_adicionais'].get(adc_serv),
-                                         "orientacaoEntregaVizinho":dados.get('orientacaoEntregaVizinho')})
-                    else:
-                        serv_adc.append({"codigoServicoAdicional":service['servicos_adicionais'].get(adc_serv)})
-
-
-                    
-                break
-
-
+        with self._span('build', 'prepostagem'):
+            template = self._build_pre_post_payload(*args, **kwargs)
+        response = self._request('POST', f'{self.default_url}prepostagem/v1/prepostagens', json = template, headers= self.header())
+        return self._handle('prepostagem', self._handle_pre_post_response, response)
 
+    def pre_post_obj_reg_bulk(self, items, max_workers=8):
+        """
+        Registra várias pré-postagens, enviando até max_workers ao mesmo tempo.
 
+        Itens com chave de idempotência (dados['chaveIdempotencia']) já aceita pela API em uma chamada anterior
+        (ver pre_post_registry) não são enviados de novo e voltam com 'reaproveitado' True: reenviar um lote
+        com falhas parciais nunca duplica objetos. Se a mesma chave aparece mais de uma vez no lote, só o
+        primeiro item é enviado e os demais voltam como falha. Itens sem chave recebem uma chave gerada
+        (gravada no próprio item e devolvida no resultado), registrada como qualquer outra: reenviar o mesmo
+        item, ou outro com essa chave, não duplica o objeto. Uma falha em um item não interrompe os demais.
 
-        template = data_c.pre_postagem
-        template.update({'destinatario': dados.get('destinatario'), 
-                         'remetente': dados.get('remetente'), 
-                         'codigoServico':dados.get('servico'),
-                         'numeroNotaFiscal': dados.get('nNFe'),
-                         'chaveNFe':dados.get('chNfe'),
-                         'numeroCartaoPostagem': self.post_card,
-                         'listaServicoAdicional':serv_adc,
-                         'pesoInformado':dados.get('pesoInformado'),
-                         'alturaInformada': dados.get('altura'),
-                         'larguraInformada': dados.get('largura'),
-                         'comprimentoInformado': dados.get('comprimento'),
-                         'solicitarColeta': dados.get('coleta'),
-                         'dataPrevistaPostagem':dados.get('dataPrevistaPostagem'),
-                         'modalidadePagamento': dados.get('pagamento'),
-                         'logisticaReversa': dados.get('reversa')
-                        } 
-                        )
-        
-        response = requests.post(self.url, json = template, headers= self.header())
-        if response.status_code == 200:
-            resposta ={}
-            
-            resposta.update({x:response.json().get(x) for x in ('id', 'codigoServico', 'numeroNotaFiscal', 'codigoObjeto', 'dataHora')})
+        Args:
+            items (iterable): Dicionários no formato de pre_post_obj_reg (lista ou gerador).
+            max_workers (int): Quantidade máxima de pré-postagens enviadas em paralelo.
 
-            
-            return(resposta)
-        else:
-            print(response.text)
-            return None
-        
-  
+        Returns:
+            list: Um resultado por item, na ordem de entrada, com as chaves 'chaveIdempotencia' (a informada ou a gerada), 'sucesso',
+                'codigoObjeto', 'resposta' (a mesma de pre_post_obj_reg), 'erro' (corpo da resposta de erro
+                da API ou mensagem de validação), 'status' (código HTTP do erro) e 'reaproveitado'
+                (True se a pré-postagem já estava registrada).
 
+        Exemplo:
+            >>> resultados = correios.pre_post_obj_reg_bulk(pre_postagens, max_workers=16)
+            >>> falhas = [r for r in resultados if not r['sucesso']]
+            >>> correios.pre_post_obj_reg_bulk([p for p, r in zip(pre_postagens, resultados) if not r['sucesso']])
+        """
+        return list(self.pre_post_obj_reg_iter(items, max_workers=max_workers))
 
-        
+    def pre_post_obj_reg_iter(self, items, max_workers=8):
+        """
+        Versão em gerador de pre_post_obj_reg_bulk: lê os itens sob demanda e devolve os resultados na ordem
+        de entrada, com no máximo max_workers envios em andamento.
+        """
+        seen = {}
+        if max_workers is None or max_workers <= 1:
+            for index, dados in enumerate(items):
+                yield self._pre_post_duplicate(dados, index, seen) or self._register_pre_post(dados)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for index, dados in enumerate(items):
+                duplicate = self._pre_post_duplicate(dados, index, seen)
+                if duplicate is not None:
+                    future = Future()
+                    future.set_result(duplicate)
+                else:
+                    future = executor.submit(self._register_pre_post, dados)
+                pending.append(future)
+                if len(pending) >= max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def _register_pre_post(self, dados):
+        key, result, template = self._pre_post_pending(dados)
+        if result is not None:
+            return result
+        sent = []
+
+        def post():
+            # Conferido de novo dentro do voo: outro item com a mesma chave pode ter acabado de ser aceito.
+            resposta = self.pre_post_registry.get(key)
+            if resposta is not None:
+                return self._pre_post_success(key, resposta, reaproveitado=True)
+            sent.append(True)
+            try:
+                response = self._request('POST', f'{self.default_url}prepostagem/v1/prepostagens', json = template, headers= self.header())
+            except requests.RequestException as error:
+                return self._pre_post_failure(key, str(error))
+            return self._pre_post_outcome(key, response)
+
+        # Chamadas simultâneas com a mesma chave (ex.: dois processos do mesmo lote) geram uma única requisição;
+        # quem só esperou pelo resultado recebe o item como reaproveitado.
+        result = self.inflight.do(('prepostagem', key), post)
+        if not sent and result['sucesso']:
+            return dict(result, reaproveitado=True)
+        return result
 
 
 if __name__ == '__main__':
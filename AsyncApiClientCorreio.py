@@ -0,0 +1,397 @@
+import asyncio
+import time
+from collections import deque
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp é opcional; só é necessário para o cliente assíncrono
+    aiohttp = None
+
+from ApiClientCorreio import DEFAULT_TIMEOUT, _BaseClientCorreios
+from resilience import DEFAULT_RETRY_POLICY, CircuitOpenResponse
+from json_codec import CodecResponse
+from tracking_table import TrackingTable
+from singleflight import AsyncSingleFlight
+
+
+class AsyncApiClientCorreios(_BaseClientCorreios):
+    """
+    Versão asyncio do ApiClientCorreios, com os mesmos endpoints (token, rastreamento, prazo, preço e pré-postagem).
+
+    A montagem dos payloads e o tratamento das respostas são os mesmos do cliente síncrono; apenas o transporte muda.
+    Todas as chamadas compartilham um único pool de conexões keep-alive, então várias consultas podem ser
+    disparadas juntas com asyncio.gather.
+
+    Exemplo:
+        >>> async with AsyncApiClientCorreios(user, acess_code, post_card, contract, None, 20) as correios:
+        ...     await correios.refresh_token()
+        ...     precos = await asyncio.gather(*(correios.price_package(dados) for dados in cotacoes))
+    """
+
+    def __init__(self, user, acess_code, post_card, contract, token, nuDR,
+                 session=None, pool_maxsize=100, keepalive_timeout=30, timeout=DEFAULT_TIMEOUT,
+                 token_mode='cartao_postagem', token_manager=None, token_store=None, tracking_cache=None,
+                 quote_cache=None, coalesce_requests=True, service_catalog=None, pre_post_registry=None,
+                 rate_limiter=None, retry_policy=DEFAULT_RETRY_POLICY, circuit_breaker=True,
+                 metrics=None, json_codec=None, tracking_store=None):
+        """
+        Args:
+            session (aiohttp.ClientSession, opcional): Sessão a ser usada por todos os endpoints.
+                Se não for informada, o cliente cria a sua na primeira chamada e a fecha em close().
+            pool_maxsize (int): Conexões simultâneas mantidas por host na sessão criada pelo cliente.
+            keepalive_timeout (float): Segundos que uma conexão ociosa fica aberta para reaproveitamento.
+            timeout (float ou tuple): Como no ApiClientCorreios: (conexão, leitura) em segundos vira
+                aiohttp.ClientTimeout(sock_connect=..., sock_read=...); um único valor é o tempo total da requisição.
+                Padrão DEFAULT_TIMEOUT, (5, 30). None espera indefinidamente.
+            token_mode, token_manager, token_store, tracking_cache, quote_cache, coalesce_requests, service_catalog,
+                pre_post_registry, rate_limiter, retry_policy, circuit_breaker, metrics, json_codec,
+                tracking_store: Como no ApiClientCorreios.
+        """
+        if aiohttp is None:
+            raise ImportError("O cliente assíncrono requer o pacote aiohttp (pip install aiohttp).")
+        super().__init__(user, acess_code, post_card, contract, token, nuDR, timeout=timeout,
+                         token_mode=token_mode, token_manager=token_manager, token_store=token_store,
+                         tracking_cache=tracking_cache, quote_cache=quote_cache,
+                         coalesce_requests=coalesce_requests, service_catalog=service_catalog,
+                         pre_post_registry=pre_post_registry, rate_limiter=rate_limiter,
+                         retry_policy=retry_policy, circuit_breaker=circuit_breaker, metrics=metrics,
+                         json_codec=json_codec, tracking_store=tracking_store)
+        self.inflight = AsyncSingleFlight()
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        self._owns_session = session is None
+        self.session = session
+
+    def _get_session(self):
+        # A sessão é criada dentro do event loop, na primeira requisição.
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_maxsize,
+                                             keepalive_timeout=self.keepalive_timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self._client_timeout())
+            self._owns_session = True
+        return self.session
+
+    def _client_timeout(self):
+        # Mesmo formato do cliente síncrono: (conexão, leitura) ou um número, aqui o tempo total.
+        if isinstance(self.timeout, (tuple, list)):
+            connect, read = self.timeout
+            return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=self.timeout)
+
+    async def _request(self, method, url, retry=True, **kwargs):
+        # Todo acesso HTTP dos endpoints passa por aqui: disjuntor, novas tentativas e limite de ritmo.
+        # O timeout também vale para uma sessão recebida de fora.
+        kwargs.setdefault('timeout', self._client_timeout())
+        endpoint = self._endpoint(url)
+        kwargs = self._encode_body(endpoint, kwargs)
+        response = await self._attempts(endpoint, method, url, kwargs, retry)
+        token = self._bearer_token(kwargs)
+        if response.status_code != 401 or token is None:
+            return response
+        self.tokens.invalidate(self.token_mode, token)
+        if not retry:
+            return response
+        fresh = await self.current_token()
+        if not fresh or fresh == token:
+            return response
+        kwargs['headers'] = self._with_token(kwargs['headers'], fresh)
+        return await self._attempts(endpoint, method, url, kwargs)
+
+    async def _attempts(self, endpoint, method, url, kwargs, retry=True):
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                if self.metrics is not None:
+                    self.metrics.record_circuit_open(endpoint)
+                return CircuitOpenResponse(endpoint, breaker.retry_in())
+            if attempt and self.metrics is not None:
+                self.metrics.record_retry(endpoint)
+            attempt += 1
+            try:
+                response = await self._send(endpoint, method, url, **kwargs)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self._record_outcome(breaker, None)
+                delay = self._retry_delay(endpoint, attempt) if retry else None
+                if delay is None:
+                    raise
+            else:
+                self._record_outcome(breaker, response.status_code)
+                delay = self._retry_delay(endpoint, attempt, response) if retry else None
+                if delay is None:
+                    return response
+            await asyncio.sleep(delay)
+
+    async def _send(self, endpoint, method, url, **kwargs):
+        # O corpo é lido por completo antes de liberar a conexão.
+        if self.rate_limiter is not None:
+            await self.rate_limiter.async_acquire(endpoint)
+        if self.metrics is None:
+            async with self._get_session().request(method, url, **kwargs) as response:
+                content = await response.read()
+                result = CodecResponse(response.status, content, response.headers, self.json_codec)
+        else:
+            start = time.perf_counter()
+            with self._span('network', endpoint):
+                try:
+                    async with self._get_session().request(method, url, **kwargs) as response:
+                        content = await response.read()
+                        result = CodecResponse(response.status, content, response.headers, self.json_codec)
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    self._record_request(endpoint, method, None, start)
+                    raise
+            self._record_request(endpoint, method, result, start, kwargs.get('data'))
+        if self.rate_limiter is not None:
+            self.rate_limiter.feedback(endpoint, result.status_code, result.headers)
+        return result
+
+    async def _coalesce(self, key, fn):
+        if not self.coalesce_requests:
+            return await fn()
+        return await self.inflight.do(key, fn)
+
+    async def close(self):
+        """Fecha o pool de conexões (somente se a sessão foi criada pelo cliente)."""
+        if self._owns_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def refresh_token(self, mode='cartao_postagem'):
+        """Versão assíncrona de ApiClientCorreios.refresh_token."""
+        if mode not in self.token_paths:
+            raise ValueError("Modo de autenticação não reconhecido.")
+
+        entry = await self.tokens.async_refresh(mode, lambda: self._fetch_token(mode))
+        if entry is not None:
+            self.token_mode = mode
+        return self._token_info(mode, entry)
+
+    async def _fetch_token(self, mode):
+        with self._span('token', 'token'):
+            url, data, header = self._token_request(mode)
+            respose = await self._request('POST', url, json= data, headers= header)
+            return self._handle('token', self._handle_token_response, respose)
+
+    async def current_token(self, mode=None):
+        """Versão assíncrona de ApiClientCorreios.current_token."""
+        mode = self.token_mode if mode is None else mode
+        entry = await self.tokens.async_token(mode, lambda: self._fetch_token(mode))
+        if entry is None:
+            return self.token
+        if mode == self.token_mode:
+            self.token = entry['token']
+        return entry['token']
+
+    async def header(self):
+        return self._auth_header(await self.current_token())
+
+    async def tracking_package(self, query_type, *args, max_workers=None):
+        """
+        Versão assíncrona de ApiClientCorreios.tracking_package.
+
+        Os lotes de 50 códigos são consultados em paralelo (no máximo max_workers ao mesmo tempo, se informado)
+        e o resultado mantém a ordem de entrada.
+        """
+        tracking_codes = self._tracking_codes(*args)
+        hits, missing_codes = self._tracking_cache_lookup(query_type, tracking_codes)
+        packages = await self._fetch_tracking_packages(query_type, missing_codes, max_workers)
+
+        with self._span('parse', 'srorastro'):
+            tracking_list = [self._parse_tracking_package(package) for package in packages]
+        return self._tracking_cache_merge(query_type, tracking_codes, hits, tracking_list)
+
+    async def tracking_package_iter(self, query_type, *args, max_workers=None):
+        """
+        Versão assíncrona de ApiClientCorreios.tracking_package_iter (gerador assíncrono).
+
+        Exemplo:
+            >>> async for objeto in correios.tracking_package_iter('U', codigos, max_workers=8):
+            ...     await gravar(objeto)
+        """
+        chunks = self._iter_tracking_chunks(*args)
+        window = max_workers if max_workers and max_workers > 1 else 1
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(asyncio.ensure_future(self._tracking_chunk_objects(query_type, chunk)))
+                if len(pending) >= window:
+                    for tracking_object in await pending.popleft():
+                        yield tracking_object
+            while pending:
+                for tracking_object in await pending.popleft():
+                    yield tracking_object
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _tracking_chunk_objects(self, query_type, tracking_codes):
+        hits, missing_codes = self._tracking_cache_lookup(query_type, tracking_codes)
+        packages = await self._fetch_tracking_chunk(query_type, missing_codes) if missing_codes else []
+        with self._span('parse', 'srorastro'):
+            tracking_list = [self._parse_tracking_package(package) for package in packages]
+        return self._tracking_cache_merge(query_type, tracking_codes, hits, tracking_list)
+
+    async def tracking_table(self, query_type, *args, max_workers=None):
+        """Versão assíncrona de ApiClientCorreios.tracking_table."""
+        table = TrackingTable()
+        async for tracking_object in self.tracking_package_iter(query_type, *args, max_workers=max_workers):
+            table.append(tracking_object)
+        return table
+
+    async def tracking_updates(self, *args, state=None, max_workers=None):
+        """Versão assíncrona de ApiClientCorreios.tracking_updates."""
+        state = self.tracking_state if state is None else state
+        tracking_codes = self._tracking_codes(*args)
+        packages = await self._fetch_tracking_packages('T', tracking_codes, max_workers)
+        return self._tracking_updates(packages, state)
+
+    async def _fetch_tracking_packages(self, query_type, tracking_codes, max_workers=None):
+        chunks = self._tracking_chunks(tracking_codes)
+        semaphore = asyncio.Semaphore(max_workers) if max_workers else None
+
+        async def fetch(chunk):
+            if semaphore is None:
+                return await self._fetch_tracking_chunk(query_type, chunk)
+            async with semaphore:
+                return await self._fetch_tracking_chunk(query_type, chunk)
+
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+
+        packages =[]
+        for result in results:
+            packages.extend(result)
+        return packages
+
+    async def _fetch_tracking_chunk(self, query_type, tracking_codes):
+        params = self._tracking_params(query_type, tracking_codes)
+
+        async def fetch():
+            response = await self._request('GET', f'{self.default_url}srorastro/v1/objetos', params= params, headers= await self.header())
+            return self._handle('srorastro', self._handle_tracking_response, response)
+
+        return await self._coalesce(self._flight_key('srorastro/v1/objetos', params), fetch)
+
+    async def delivery_forecast(self, types, *args):
+        """Versão assíncrona de ApiClientCorreios.delivery_forecast."""
+        headers = await self.header()
+        with self._span('build', 'prazo'):
+            body = self._encode_payload(self._build_forecast_payload(types, *args))
+
+        async def post():
+            response = await self._request('POST', f'{self.default_url}prazo/v1/nacional', data = body, headers= headers)
+            return self._handle('prazo', self._handle_forecast_response, response)
+
+        return await self._coalesce(self._flight_key('prazo/v1/nacional', body), post)
+
+    async def price_package(self, *args, **kwargs):
+        """Versão assíncrona de ApiClientCorreios.price_package."""
+        dados = self._price_data(*args, **kwargs)
+        hits, missing = self._quote_cache_lookup(dados)
+        if not missing:
+            return self._quote_cache_merge(dados, hits, [])
+
+        with self._span('build', 'preco'):
+            body = self._encode_payload(self._build_price_payload(dict(dados, coProduto=missing)))
+        headers = await self.header()
+
+        async def post():
+            response = await self._request('POST', f'{self.default_url}preco/v1/nacional', data = body, headers= headers)
+            return self._handle('preco', self._handle_price_response, response)
+
+        resposta = await self._coalesce(self._flight_key('preco/v1/nacional', body), post)
+        return self._quote_cache_merge(dados, hits, resposta)
+
+    async def price_package_bulk(self, shipments, max_workers=None):
+        """Versão assíncrona de ApiClientCorreios.price_package_bulk."""
+        with self._span('build', 'preco'):
+            lots, origins = self._build_price_lots(shipments)
+        responses = await self._send_lots(lots, self._post_price_lot, max_workers)
+        return self._map_price_lots(len(shipments), lots, origins, responses)
+
+    async def _post_price_lot(self, lot):
+        response = await self._request('POST', f'{self.default_url}preco/v1/nacional', json = lot, headers= await self.header())
+        return self._handle('preco', self._handle_price_lot_response, response)
+
+    async def delivery_forecast_bulk(self, types, routes, max_workers=None):
+        """Versão assíncrona de ApiClientCorreios.delivery_forecast_bulk."""
+        with self._span('build', 'prazo'):
+            lots, origins = self._build_forecast_lots(types, routes)
+        responses = await self._send_lots(lots, self._post_forecast_lot, max_workers)
+        return self._map_forecast_lots(routes, lots, origins, responses)
+
+    async def _post_forecast_lot(self, lot):
+        response = await self._request('POST', f'{self.default_url}prazo/v1/nacional', json = lot, headers= await self.header())
+        return self._handle('prazo', self._handle_forecast_response, response)
+
+    async def _send_lots(self, lots, post, max_workers=None):
+        # Envia os lotes ao mesmo tempo (no máximo max_workers, se informado), mantendo a ordem das respostas.
+        semaphore = asyncio.Semaphore(max_workers) if max_workers else None
+
+        async def send(lot):
+            if semaphore is None:
+                return await post(lot)
+            async with semaphore:
+                return await post(lot)
+
+        return await asyncio.gather(*(send(lot) for lot in lots))
+
+    async def pre_post_obj_reg(self, *args, **kwargs):
+        """Versão assíncrona de ApiClientCorreios.pre_post_obj_reg."""
+        with self._span('build', 'prepostagem'):
+            template = self._build_pre_post_payload(*args, **kwargs)
+        headers = await self.header()
+        response = await self._request('POST', f'{self.default_url}prepostagem/v1/prepostagens', json = template, headers= headers)
+        return self._handle('prepostagem', self._handle_pre_post_response, response)
+
+    async def pre_post_obj_reg_bulk(self, items, max_workers=8):
+        """Versão assíncrona de ApiClientCorreios.pre_post_obj_reg_bulk."""
+        return [result async for result in self.pre_post_obj_reg_iter(items, max_workers=max_workers)]
+
+    async def pre_post_obj_reg_iter(self, items, max_workers=8):
+        """Versão assíncrona de ApiClientCorreios.pre_post_obj_reg_iter (gerador assíncrono)."""
+        window = max_workers if max_workers and max_workers > 1 else 1
+        pending = deque()
+        seen = {}
+        try:
+            for index, dados in enumerate(items):
+                duplicate = self._pre_post_duplicate(dados, index, seen)
+                if duplicate is not None:
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_result(duplicate)
+                else:
+                    task = asyncio.ensure_future(self._register_pre_post(dados))
+                pending.append(task)
+                if len(pending) >= window:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _register_pre_post(self, dados):
+        key, result, template = self._pre_post_pending(dados)
+        if result is not None:
+            return result
+        sent = []
+
+        async def post():
+            resposta = self.pre_post_registry.get(key)
+            if resposta is not None:
+                return self._pre_post_success(key, resposta, reaproveitado=True)
+            sent.append(True)
+            try:
+                response = await self._request('POST', f'{self.default_url}prepostagem/v1/prepostagens', json = template, headers= await self.header())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                return self._pre_post_failure(key, str(error))
+            return self._pre_post_outcome(key, response)
+
+        result = await self.inflight.do(('prepostagem', key), post)
+        if not sent and result['sucesso']:
+            return dict(result, reaproveitado=True)
+        return result
@@ -0,0 +1,199 @@
+"""
+Testes de carga do ApiClientCorreios contra o servidor simulado (mock_correios.py).
+
+Para cada cenário (rastreamento, cotação e pré-postagem), tamanho de lote e nível de concorrência, mede
+requisições/s, itens/s, latência p50/p99 das requisições, erros e pico de memória, e grava tudo em JSON
+para comparar versões.
+
+Uso:
+    python benchmarks/bench.py --output resultados.json
+    python benchmarks/bench.py --scenarios tracking --batches 500,5000 --concurrency 1,8,32 --latency 0.05
+    python benchmarks/bench.py --output novo.json --compare resultados.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ApiClientCorreio import ApiClientCorreios  # noqa: E402
+from metrics import ClientMetrics  # noqa: E402
+from mock_correios import MockCorreiosServer  # noqa: E402
+
+SCENARIOS = ('tracking', 'quote', 'prepost')
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _tracking(client, batch, concurrency, run):
+    codes = [f'AB{run:03d}{i:06d}BR' for i in range(batch)]
+    return len(client.tracking_package('T', codes, max_workers=concurrency))
+
+
+def _quote(client, batch, concurrency, run):
+    shipments = [{'coProduto': ['03220', '03298'], 'servicosAdicionais': ['AR'], 'cepOrigem': '01000000',
+                  'cepDestino': f'{20000000 + run * 100000 + i:08d}', 'psObjeto': str(100 + i % 900),
+                  'tpObjeto': '2', 'comprimento': '20', 'largura': '15', 'altura': '10', 'dtEvento': '05/04/2024'}
+                 for i in range(batch)]
+    return sum(r is not None for r in client.price_package_bulk(shipments, max_workers=concurrency))
+
+
+def _prepost(client, batch, concurrency, run):
+    items = ({'servico': '03298', 'codigosServicosAdicionais': ['AR'], 'nNFe': f'{run}-{i}', 'pesoInformado': '300',
+              'destinatario': {'nome': f'Destinatário {i}', 'endereco': {'cep': '01000000', 'uf': 'SP'}},
+              'remetente': {'nome': 'Loja', 'endereco': {'cep': '30000000', 'uf': 'MG'}},
+              'dataPrevistaPostagem': '05/04/2024', 'pagamento': '2', 'reversa': 'N', 'coleta': 'N'}
+             for i in range(batch))
+    return sum(r['sucesso'] for r in client.pre_post_obj_reg_bulk(items, max_workers=concurrency))
+
+
+_RUNNERS = {'tracking': _tracking, 'quote': _quote, 'prepost': _prepost}
+
+
+def run_case(server, scenario, batch, concurrency, run=0, memory=True):
+    """Executa um cenário e devolve o dicionário de resultados."""
+    metrics = ClientMetrics()
+    latencies = []
+    lock = threading.Lock()
+
+    def hook(event):
+        if event['type'] == 'request':
+            with lock:
+                latencies.append(event['seconds'])
+
+    metrics.add_hook(hook)
+    client = ApiClientCorreios('usuario', 'codigo', '0000000000', '9999999999', 'token-benchmark', 20,
+                               pool_maxsize=max(10, concurrency), metrics=metrics)
+    client.default_url = server.url
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok = _RUNNERS[scenario](client, batch, concurrency, run)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    client.close()
+
+    snapshot = metrics.snapshot()
+    requests_total = sum(entry['requests'] for entry in snapshot.values())
+    failures = sum(count for entry in snapshot.values() for status, count in entry['by_status'].items()
+                   if status == 'error' or int(status) >= 400)
+    return {
+        'scenario': scenario,
+        'batch': batch,
+        'concurrency': concurrency,
+        'seconds': round(seconds, 4),
+        'items_ok': ok,
+        'items_per_s': round(batch / seconds, 2) if seconds else None,
+        'requests': requests_total,
+        'requests_per_s': round(requests_total / seconds, 2) if seconds else None,
+        'http_errors': failures,
+        'retries': sum(entry['retries'] for entry in snapshot.values()),
+        'latency_p50_ms': round(_percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'latency_p99_ms': round(_percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        'peak_memory_kb': round(peak / 1024, 1) if peak is not None else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Imprime a variação de itens/s e de p99 em relação a um arquivo de resultados anterior."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['scenario'], r['batch'], r['concurrency']): r for r in json.load(f)['results']}
+    print(f"\n{'cenário':<10}{'lote':>7}{'conc':>6}{'itens/s':>12}{'Δ':>9}{'p99 ms':>10}{'Δ':>9}")
+    for r in results:
+        old = baseline.get((r['scenario'], r['batch'], r['concurrency']))
+        if old is None:
+            continue
+
+        def delta(new, previous):
+            if not new or not previous:
+                return '-'
+            return f'{(new / previous - 1) * 100:+.1f}%'
+
+        print(f"{r['scenario']:<10}{r['batch']:>7}{r['concurrency']:>6}{r['items_per_s'] or 0:>12.1f}"
+              f"{delta(r['items_per_s'], old['items_per_s']):>9}{r['latency_p99_ms'] or 0:>10.2f}"
+              f"{delta(r['latency_p99_ms'], old['latency_p99_ms']):>9}")
+
+
+def _ints(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Testes de carga do ApiClientCorreios contra o servidor simulado.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='tracking,quote,prepost')
+    parser.add_argument('--batches', default='50,500,2000', help='Tamanhos de lote (itens por execução).')
+    parser.add_argument('--concurrency', default='1,8,32', help='Valores de max_workers.')
+    parser.add_argument('--repeat', type=int, default=1, help='Execuções por combinação.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Latência simulada por requisição (s).')
+    parser.add_argument('--jitter', type=float, default=0.005)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=int, default=0, help='Requisições/s por endpoint antes do 429.')
+    parser.add_argument('--no-memory', action='store_true', help='Não mede memória (tracemalloc deixa tudo mais lento).')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Arquivo de resultados anterior para comparação.')
+    args = parser.parse_args(argv)
+
+    config = {k: v for k, v in vars(args).items() if k not in ('output', 'compare')}
+    results = []
+    with MockCorreiosServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                            throttle=args.throttle, seed=args.seed) as server:
+        print(f"{'cenário':<10}{'lote':>7}{'conc':>6}{'req/s':>10}{'itens/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'mem KB':>10}")
+        for scenario in args.scenarios.split(','):
+            for batch in _ints(args.batches):
+                for concurrency in _ints(args.concurrency):
+                    for run in range(args.repeat):
+                        r = run_case(server, scenario, batch, concurrency, run, memory=not args.no_memory)
+                        results.append(r)
+                        print(f"{scenario:<10}{batch:>7}{concurrency:>6}{r['requests_per_s'] or 0:>10.1f}"
+                              f"{r['items_per_s'] or 0:>10.1f}{r['latency_p50_ms'] or 0:>9.2f}"
+                              f"{r['latency_p99_ms'] or 0:>9.2f}{r['peak_memory_kb'] or 0:>10.1f}")
+
+    document = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': config,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    print(f'\nResultados gravados em {args.output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
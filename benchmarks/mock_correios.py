@@ -0,0 +1,238 @@
+"""
+Servidor local que imita os endpoints da API dos Correios usados pelo cliente, para testes de carga.
+
+Endpoints: token/v1/autentica/*, srorastro/v1/objetos, prazo/v1/nacional, preco/v1/nacional e
+prepostagem/v1/prepostagens. A latência, a taxa de erros 500 e o limite de requisições por segundo
+(acima dele a resposta é 429 com Retry-After) são configuráveis.
+
+Uso:
+    python benchmarks/mock_correios.py --port 8080 --latency 0.05 --error-rate 0.01 --throttle 200
+
+    >>> servidor = MockCorreiosServer(latency=0.02).start()
+    >>> correios = ApiClientCorreios(...)
+    >>> correios.default_url = servidor.url
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_UFS = ('SP', 'MG', 'RJ', 'PR', 'RS', 'BA', 'SC', 'GO', 'PE', 'CE')
+_CIDADES = ('SAO PAULO', 'BELO HORIZONTE', 'RIO DE JANEIRO', 'CURITIBA', 'PORTO ALEGRE', 'SALVADOR',
+            'FLORIANOPOLIS', 'GOIANIA', 'RECIFE', 'FORTALEZA')
+_DESCRICOES = ('Objeto postado', 'Objeto em trânsito - por favor aguarde', 'Objeto saiu para entrega ao destinatário',
+               'Objeto entregue ao destinatário')
+
+
+def _evento(codigo, i, n):
+    # Eventos determinísticos por código: do mais recente (i = 0) para o mais antigo.
+    k = (sum(map(ord, codigo)) + i) % len(_UFS)
+    quando = datetime(2024, 4, 1, 8) + timedelta(hours=6 * (n - i))
+    return {
+        'codigo': 'BDE' if i == 0 else 'RO',
+        'descricao': _DESCRICOES[min(n - 1 - i, len(_DESCRICOES) - 1)],
+        'dtHrCriado': quando.strftime('%Y-%m-%dT%H:%M:%S'),
+        'unidade': {'tipo': 'Unidade de Tratamento', 'endereco': {'cidade': _CIDADES[k], 'uf': _UFS[k]}},
+    }
+
+
+def tracking_object(codigo, events=4):
+    if not codigo[:2].isalpha():
+        return {'codObjeto': codigo, 'mensagem': 'SRO-020: Objeto não encontrado na base de dados dos Correios.'}
+    n = 1 + sum(map(ord, codigo)) % events
+    return {
+        'codObjeto': codigo,
+        'dtPrevista': '2024-04-10T23:59:59',
+        'eventos': [_evento(codigo, i, n) for i in range(n)],
+    }
+
+
+class _Throttle:
+    # Janela deslizante de 1 segundo por endpoint.
+    def __init__(self, limit):
+        self.limit = limit
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def exceeded(self, endpoint):
+        if not self.limit:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            window = [t for t in self.windows.get(endpoint, ()) if now - t < 1.0]
+            exceeded = len(window) >= self.limit
+            if not exceeded:
+                window.append(now)
+            self.windows[endpoint] = window
+            return exceeded
+
+
+class MockCorreiosServer:
+    """
+    Servidor HTTP local (em uma thread) que responde como a API dos Correios.
+
+    Args:
+        host (str), port (int): Endereço de escuta. Porta 0 escolhe uma porta livre.
+        latency (float): Latência média, em segundos, acrescentada a cada resposta.
+        jitter (float): Variação máxima (+/-) da latência, em segundos.
+        error_rate (float): Fração das requisições respondidas com 500.
+        throttle (int): Requisições por segundo aceitas por endpoint; acima disso a resposta é 429. 0 desativa.
+        retry_after (float): Valor do cabeçalho Retry-After nas respostas 429.
+        seed (int, opcional): Semente do sorteio de erros, para execuções reproduzíveis.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, throttle=0,
+                 retry_after=1.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.throttle = _Throttle(throttle)
+        self.random = random.Random(seed)
+        self.counts = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts = {}
+
+    def _count(self, endpoint, status):
+        with self._lock:
+            key = (endpoint, status)
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def _next_id(self):
+        with self._lock:
+            return next(self._ids)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Cabeçalhos e corpo saem em escritas separadas; sem isso, Nagle + ACK atrasado somam ~40 ms
+            # a cada resposta em conexões keep-alive.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                content = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            def _route(self, method):
+                url = urlparse(self.path)
+                endpoint = url.path.lstrip('/').split('/', 1)[0]
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+
+                delay = server.latency + (server.random.uniform(-server.jitter, server.jitter) if server.jitter else 0)
+                if delay > 0:
+                    time.sleep(delay)
+
+                if server.throttle.exceeded(endpoint):
+                    server._count(endpoint, 429)
+                    return self._send(429, {'msgs': ['Limite de requisições excedido.']},
+                                      {'Retry-After': f'{server.retry_after:g}'})
+                if server.error_rate and server.random.random() < server.error_rate:
+                    server._count(endpoint, 500)
+                    return self._send(500, {'msgs': ['Erro interno simulado.']})
+
+                body = json.loads(raw) if raw else None
+                status, response = server.respond(method, url, endpoint, body)
+                server._count(endpoint, status)
+                self._send(status, response)
+
+            def do_GET(self):
+                self._route('GET')
+
+            def do_POST(self):
+                self._route('POST')
+
+        return Handler
+
+    def respond(self, method, url, endpoint, body):
+        """Monta a resposta de um endpoint (status, corpo)."""
+        if endpoint == 'token':
+            now = datetime.now()
+            return 201, {'token': f'mock-{self._next_id()}', 'emissao': now.strftime('%Y-%m-%dT%H:%M:%S'),
+                         'expiraEm': (now + timedelta(hours=24)).strftime('%Y-%m-%dT%H:%M:%S')}
+        if endpoint == 'srorastro':
+            codigos = parse_qs(url.query).get('codigosObjetos', [])
+            return 200, {'versao': 'mock', 'quantidade': len(codigos),
+                         'objetos': [tracking_object(codigo) for codigo in codigos]}
+        if endpoint == 'prazo':
+            return 200, [{'coProduto': p.get('coProduto'), 'nuRequisicao': p.get('nuRequisicao'), 'prazoEntrega': 3,
+                          'dataMaxima': '2024-04-10T23:59:59'} for p in body.get('parametrosPrazo', [])]
+        if endpoint == 'preco':
+            return 200, [{'coProduto': p.get('coProduto'), 'nuRequisicao': p.get('nuRequisicao'),
+                          'pcFinal': '%.2f' % (20 + float(str(p.get('psObjeto') or 0).replace(',', '.')) / 100)}
+                         for p in body.get('parametrosProduto', [])]
+        if endpoint == 'prepostagem':
+            numero = self._next_id()
+            return 200, {'id': f'PRE{numero}', 'codigoServico': body.get('codigoServico'),
+                         'numeroNotaFiscal': body.get('numeroNotaFiscal'), 'codigoObjeto': f'AB{numero:09d}BR',
+                         'dataHora': datetime.now().strftime('%Y-%m-%dT%H:%M:%S')}
+        return 404, {'msgs': ['Endpoint não encontrado.']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local que imita a API dos Correios.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--throttle', type=int, default=0)
+    parser.add_argument('--retry-after', type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = MockCorreiosServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.throttle,
+                                args.retry_after)
+    print(f'Servidor simulado dos Correios em {server.url}')
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
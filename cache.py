@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+
+_DEFAULT = object()
+
+
+class TTLCache:
+    """
+    Cache em memória com limite de tamanho (LRU) e validade por entrada, seguro para uso entre threads.
+
+    Args:
+        maxsize (int): Quantidade máxima de entradas; ao ultrapassar, a menos usada recentemente é descartada.
+        ttl (float or None): Validade padrão das entradas, em segundos. None significa sem expiração.
+
+    Exemplo:
+        >>> cache = TTLCache(maxsize=1000, ttl=60)
+        >>> cache.set(('AA000000000BR', 'U'), resultado)
+        >>> cache.get(('AA000000000BR', 'U'))
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retorna o valor guardado para a chave, ou default se não existir ou estiver vencido."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires_at = item
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=_DEFAULT):
+        """
+        Guarda o valor para a chave.
+
+        Args:
+            ttl (float or None, opcional): Validade desta entrada, em segundos. Se omitido usa self.ttl;
+                None faz a entrada não expirar (ela ainda pode ser descartada pelo limite de tamanho).
+        """
+        ttl = self.ttl if ttl is _DEFAULT else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Remove a chave do cache e retorna o seu valor (mesmo que vencido)."""
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self):
+        """Remove todas as entradas e zera os contadores."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Retorna um dicionário com 'hits', 'misses' e 'size'."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _DEFAULT) is not _DEFAULT
@@ -0,0 +1,72 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele o módulo json da biblioteca padrão é usado
+    orjson = None
+
+
+class StdlibJsonCodec:
+    """Codificação JSON com o módulo json da biblioteca padrão."""
+
+    name = 'json'
+
+    @staticmethod
+    def dumps(obj):
+        # default=str como no OrjsonCodec: Decimal, date etc. viram texto com qualquer um dos codecs.
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    """Codificação JSON com orjson (bem mais rápido na leitura das respostas grandes do rastreamento)."""
+
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requer o pacote orjson (pip install orjson).")
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj, default=str)
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+def default_codec():
+    """Retorna o OrjsonCodec se o orjson estiver instalado, senão o StdlibJsonCodec."""
+    return OrjsonCodec() if orjson is not None else StdlibJsonCodec()
+
+
+class CodecResponse:
+    """
+    Resposta HTTP já lida, com o corpo decodificado no máximo uma vez pelo codec do cliente.
+
+    Tem a interface usada pelos tratadores de resposta (status_code, headers, content, text e json()).
+    """
+
+    __slots__ = ('status_code', 'content', 'headers', 'codec', '_json')
+
+    _PENDING = object()
+
+    def __init__(self, status_code, content, headers, codec):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.codec = codec
+        self._json = self._PENDING
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        if self._json is self._PENDING:
+            self._json = self.codec.loads(self.content)
+        return self._json
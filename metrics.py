@@ -0,0 +1,214 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Limites (em segundos) dos histogramas de latência.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Fases instrumentadas: renovação do token, montagem do payload, rede e leitura/conversão da resposta.
+PHASES = ('token', 'build', 'network', 'parse')
+
+
+class Histogram:
+    """Histograma com limites fixos, no formato do Prometheus (contagens cumulativas na exportação)."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, limit in enumerate(self.buckets):
+            if value <= limit:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Retorna [(limite, contagem acumulada)], terminando em ('+Inf', total)."""
+        result = []
+        total = 0
+        for limit, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((limit, total))
+        return result
+
+    def quantile(self, q):
+        """Estimativa do quantil q (0 a 1) pelo limite superior do bucket correspondente."""
+        if not self.count:
+            return None
+        target = q * self.count
+        for limit, total in self.cumulative():
+            if total >= target:
+                return float('inf') if limit == '+Inf' else limit
+        return float('inf')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class ClientMetrics:
+    """
+    Métricas e pontos de instrumentação dos clientes, por endpoint ('srorastro', 'preco', 'prazo', 'prepostagem', 'token').
+
+    Conta requisições por código HTTP, erros de conexão, novas tentativas e chamadas barradas pelo disjuntor;
+    mede a latência de rede e de cada fase ('token', 'build', 'network', 'parse') em histogramas, e soma os
+    bytes enviados e recebidos. Pode ser compartilhado entre clientes e threads.
+
+    Para integrar com sistemas de tracing, registre ganchos com add_hook (recebem um dicionário ao fim de cada
+    fase e de cada requisição) ou informe tracer: uma função (nome, atributos) que devolve um gerenciador de
+    contexto aberto em volta de cada fase (ex.: tracer.start_as_current_span do OpenTelemetry).
+
+    Args:
+        buckets (tuple): Limites dos histogramas, em segundos.
+        tracer (callable, opcional): Fábrica de spans, chamada como tracer('correios.<fase>', atributos).
+
+    Exemplo:
+        >>> metricas = ClientMetrics()
+        >>> correios = ApiClientCorreios(..., metrics=metricas)
+        >>> metricas.add_hook(lambda evento: log.debug(evento))
+        >>> print(metricas.to_prometheus())
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, tracer=None):
+        self.buckets = tuple(buckets)
+        self.tracer = tracer
+        self.requests = {}
+        self.errors = {}
+        self.retries = {}
+        self.circuit_open = {}
+        self.request_bytes = {}
+        self.response_bytes = {}
+        self.latency = {}
+        self.phases = {}
+        self._hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """Registra uma função chamada com um dicionário ao fim de cada fase ('type': 'span') e requisição ('type': 'request')."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _emit(self, event):
+        for hook in list(self._hooks):
+            hook(event)
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    @contextmanager
+    def span(self, phase, endpoint=''):
+        """Mede uma fase (gerenciador de contexto), repassando-a ao tracer e aos ganchos."""
+        scope = self.tracer(f'correios.{phase}', {'correios.endpoint': endpoint}) if self.tracer else None
+        start = time.perf_counter()
+        error = None
+        try:
+            if scope is None:
+                yield
+            else:
+                with scope:
+                    yield
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._histogram(self.phases, (phase, endpoint)).observe(seconds)
+            if self._hooks:
+                self._emit({'type': 'span', 'phase': phase, 'endpoint': endpoint, 'seconds': seconds, 'error': error})
+
+    def record_request(self, endpoint, method, status_code, seconds, request_bytes=0, response_bytes=0):
+        """Registra uma requisição concluída (status_code None para erro de conexão ou timeout)."""
+        status = 'error' if status_code is None else str(status_code)
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status_code is None:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self.request_bytes[endpoint] = self.request_bytes.get(endpoint, 0) + (request_bytes or 0)
+            self.response_bytes[endpoint] = self.response_bytes.get(endpoint, 0) + (response_bytes or 0)
+            self._histogram(self.latency, endpoint).observe(seconds)
+        if self._hooks:
+            self._emit({'type': 'request', 'endpoint': endpoint, 'method': method, 'status': status_code,
+                        'seconds': seconds, 'request_bytes': request_bytes, 'response_bytes': response_bytes})
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + 1
+
+    def record_circuit_open(self, endpoint):
+        with self._lock:
+            self.circuit_open[endpoint] = self.circuit_open.get(endpoint, 0) + 1
+
+    def snapshot(self):
+        """Resumo por endpoint: requisições, erros, bytes e latência (média, p50 e p99 estimados)."""
+        with self._lock:
+            result = {}
+            for (endpoint, _, status), count in self.requests.items():
+                entry = result.setdefault(endpoint, {'requests': 0, 'by_status': {}})
+                entry['requests'] += count
+                entry['by_status'][status] = entry['by_status'].get(status, 0) + count
+            for endpoint, entry in result.items():
+                histogram = self.latency.get(endpoint)
+                entry.update({
+                    'errors': self.errors.get(endpoint, 0),
+                    'retries': self.retries.get(endpoint, 0),
+                    'circuit_open': self.circuit_open.get(endpoint, 0),
+                    'request_bytes': self.request_bytes.get(endpoint, 0),
+                    'response_bytes': self.response_bytes.get(endpoint, 0),
+                    'latency_avg': histogram.sum / histogram.count if histogram and histogram.count else None,
+                    'latency_p50': histogram.quantile(0.5) if histogram else None,
+                    'latency_p99': histogram.quantile(0.99) if histogram else None,
+                })
+            return result
+
+    def to_prometheus(self, prefix='pycorreios'):
+        """Exporta as métricas no formato texto do Prometheus (versão 0.0.4)."""
+        lines = []
+
+        def counter(name, help_text, values, label_names):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f'{prefix}_{name}{_labels(**dict(zip(label_names, key)))} {value}')
+
+        def histogram(name, help_text, values, label_names):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} histogram')
+            for key, hist in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                labels = dict(zip(label_names, key))
+                for limit, total in hist.cumulative():
+                    lines.append(f'{prefix}_{name}_bucket{_labels(le=limit, **labels)} {total}')
+                lines.append(f'{prefix}_{name}_sum{_labels(**labels)} {hist.sum}')
+                lines.append(f'{prefix}_{name}_count{_labels(**labels)} {hist.count}')
+
+        with self._lock:
+            counter('requests_total', 'Requisições HTTP à API dos Correios.', self.requests, ('endpoint', 'method', 'status'))
+            counter('request_errors_total', 'Requisições sem resposta (timeout ou erro de conexão).', self.errors, ('endpoint',))
+            counter('retries_total', 'Novas tentativas feitas pela política de retry.', self.retries, ('endpoint',))
+            counter('circuit_open_total', 'Chamadas barradas pelo disjuntor aberto.', self.circuit_open, ('endpoint',))
+            counter('request_bytes_total', 'Bytes enviados no corpo das requisições.', self.request_bytes, ('endpoint',))
+            counter('response_bytes_total', 'Bytes recebidos no corpo das respostas.', self.response_bytes, ('endpoint',))
+            histogram('request_duration_seconds', 'Latência de rede por requisição.', self.latency, ('endpoint',))
+            histogram('phase_duration_seconds', 'Duração de cada fase (token, build, network, parse).', self.phases,
+                      ('phase', 'endpoint'))
+        return '\n'.join(lines) + '\n'
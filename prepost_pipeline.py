@@ -0,0 +1,300 @@
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import deque
+from itertools import islice
+
+from prepost_registry import KEY_FIELD, idempotency_key
+
+# Campos sem os quais uma linha nem é enviada à API.
+REQUIRED_FIELDS = ('servico', 'remetente', 'destinatario')
+
+# Campos obrigatórios do remetente e do destinatário, e do endereço de cada um.
+REQUIRED_PARTY_FIELDS = ('nome',)
+REQUIRED_ADDRESS_FIELDS = ('cep', 'logradouro', 'cidade', 'uf')
+
+_RESULT_FIELDS = ('linha', 'chaveIdempotencia', 'sucesso', 'codigoObjeto', 'status', 'reaproveitado', 'erro')
+
+# Tamanho dos blocos lidos ao calcular input_fingerprint.
+_FINGERPRINT_BLOCK = 1024 * 1024
+
+
+class InvalidRow(dict):
+    """
+    Linha que não pôde ser lida (ex.: JSON inválido no JSON Lines). É um dicionário vazio, para não interromper
+    quem só itera as linhas, com a descrição do problema em 'erro'.
+    """
+
+    def __init__(self, erro):
+        super().__init__()
+        self.erro = erro
+
+
+def _format(path, file_format=None):
+    if file_format:
+        return file_format.lower()
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_rows(path, file_format=None, encoding='utf-8'):
+    """
+    Lê as linhas de um arquivo CSV (com cabeçalho) ou JSON Lines sob demanda, uma por vez.
+
+    Args:
+        path (str): Caminho do arquivo, ou '-' para a entrada padrão.
+        file_format (str, opcional): 'csv' ou 'jsonl'. Por padrão é deduzido pela extensão ('jsonl' para '-').
+
+    Yields:
+        dict: Uma linha por vez. Linhas em branco do JSON Lines são ignoradas; linhas que não são um objeto JSON
+            válido viram InvalidRow, sem interromper a leitura das seguintes.
+    """
+    if path == '-':
+        yield from _parse_rows(sys.stdin, file_format or 'jsonl')
+        return
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        yield from _parse_rows(f, _format(path, file_format))
+
+
+def _parse_rows(f, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(f)
+    else:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield InvalidRow(f'JSON inválido: {exc}.')
+                continue
+            yield row if isinstance(row, dict) else InvalidRow('A linha não é um objeto JSON.')
+
+
+def input_fingerprint(path):
+    """
+    Identifica o conteúdo de um arquivo de entrada pelo sha256 do arquivo inteiro.
+
+    Um novo arquivo gravado no mesmo caminho (ex.: a exportação do dia seguinte, mesmo que só mude no final)
+    tem outra identificação, enquanto o mesmo arquivo copiado, movido ou com a data de modificação alterada
+    mantém a sua.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_FINGERPRINT_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _row_key(fingerprint, linha, dados):
+    # Chave de uma linha sem chaveIdempotencia: a mesma linha do mesmo arquivo gera sempre a mesma chave.
+    content = json.dumps([fingerprint, linha, dados], sort_keys=True, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def row_to_pre_post(row):
+    """
+    Converte uma linha do arquivo nos dados de pre_post_obj_reg.
+
+    Colunas com ponto viram dicionários aninhados ('destinatario.endereco.cep' -> dados['destinatario']['endereco']['cep'])
+    e 'codigosServicosAdicionais' pode vir como texto separado por ';', ',' ou '|'. Linhas de JSON Lines que
+    já estão no formato de pre_post_obj_reg passam sem alteração.
+    """
+    dados = {}
+    for column, value in row.items():
+        if column is None:
+            continue
+        target = dados
+        parts = column.strip().split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+
+    adicionais = dados.get('codigosServicosAdicionais')
+    if isinstance(adicionais, str):
+        dados['codigosServicosAdicionais'] = [x.strip() for x in re.split(r'[;,|]', adicionais) if x.strip()]
+    return dados
+
+
+def validate_pre_post(dados):
+    """
+    Retorna a lista de problemas que impedem o envio dos dados (vazia se estiverem completos).
+
+    Além de servico, remetente e destinatario, confere o nome e o endereço de cada parte (cep com 8 dígitos,
+    logradouro, cidade e uf), para que a linha falhe aqui e não como um 400 da API.
+    """
+    errors = [f"Campo obrigatório ausente: '{field}'." for field in REQUIRED_FIELDS if not dados.get(field)]
+    for party in ('remetente', 'destinatario'):
+        value = dados.get(party)
+        if not value:
+            continue
+        if not isinstance(value, dict):
+            errors.append(f"Campo '{party}' inválido.")
+            continue
+        errors.extend(f"Campo obrigatório ausente: '{party}.{field}'."
+                      for field in REQUIRED_PARTY_FIELDS if not value.get(field))
+        endereco = value.get('endereco')
+        if not isinstance(endereco, dict):
+            errors.append(f"Campo obrigatório ausente: '{party}.endereco'.")
+            continue
+        errors.extend(f"Campo obrigatório ausente: '{party}.endereco.{field}'."
+                      for field in REQUIRED_ADDRESS_FIELDS if not endereco.get(field))
+        cep = endereco.get('cep')
+        if cep and len(re.sub(r'\D', '', str(cep))) != 8:
+            errors.append(f"CEP inválido em '{party}.endereco.cep': {cep}.")
+    return errors
+
+
+class PrePostPipeline:
+    """
+    Registra as pré-postagens de um arquivo CSV/JSON Lines de forma contínua e retomável.
+
+    As linhas são lidas sob demanda, convertidas por mapper, validadas e enviadas em paralelo por
+    ApiClientCorreios.pre_post_obj_reg_iter; cada resultado é gravado no arquivo de saída assim que chega,
+    na ordem de entrada. O arquivo de checkpoint guarda quantas linhas já foram concluídas, o tamanho da
+    saída nesse ponto e a identificação do arquivo de entrada (input_fingerprint); se o processo cair, run()
+    recomeça da linha seguinte ao último checkpoint. Se o arquivo de entrada for outro (mesmo que no mesmo
+    caminho), o checkpoint é descartado e o processamento começa do início.
+
+    Linhas enviadas depois do último checkpoint são reenviadas na retomada. Para que isso nunca duplique
+    objetos, use no cliente um FilePrePostRegistry: as chaves já aceitas pela API são reaproveitadas.
+    Linhas sem chaveIdempotencia recebem em run() uma chave derivada do arquivo, da linha e do conteúdo.
+
+    Args:
+        client (ApiClientCorreios): Cliente usado no registro.
+        output_path (str): Arquivo de resultados (.csv ou JSON Lines), um por linha de entrada.
+        checkpoint_path (str, opcional): Arquivo de checkpoint. Padrão é output_path + '.checkpoint'.
+        mapper (callable): Converte uma linha do arquivo nos dados de pre_post_obj_reg.
+        max_workers (int): Quantidade máxima de pré-postagens enviadas em paralelo.
+        checkpoint_every (int): Quantidade de linhas concluídas entre dois checkpoints.
+
+    Exemplo:
+        >>> correios = ApiClientCorreios(..., pre_post_registry=FilePrePostRegistry('registradas.jsonl'))
+        >>> pipeline = PrePostPipeline(correios, 'resultados.jsonl', max_workers=16)
+        >>> pipeline.run('pedidos.csv')
+        {'linhas': 120000, 'sucesso': 119874, 'falha': 126, 'retomado_em': 80000}
+    """
+
+    def __init__(self, client, output_path, checkpoint_path=None, mapper=row_to_pre_post, max_workers=8,
+                 checkpoint_every=100, output_format=None):
+        self.client = client
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+        self.mapper = mapper
+        self.max_workers = max_workers
+        self.checkpoint_every = checkpoint_every
+        self.output_format = _format(output_path, output_format)
+
+    def load_checkpoint(self, input_path, fingerprint=None):
+        """
+        Retorna o checkpoint gravado para o arquivo de entrada ({'linha': ..., 'offset': ...}), ou None se não
+        houver um ou se ele foi gravado para outro arquivo ou para outro conteúdo no mesmo caminho.
+        """
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get('entrada') != os.path.abspath(input_path):
+            return None
+        if checkpoint.get('conteudo') != (fingerprint or input_fingerprint(input_path)):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, input_path, fingerprint, linha, offset):
+        data = {'entrada': os.path.abspath(input_path), 'conteudo': fingerprint, 'linha': linha, 'offset': offset}
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.prepost-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.checkpoint_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def results(self, rows, start=0, fingerprint=None):
+        """
+        Registra as linhas (iterável de dicts do arquivo) e devolve (número da linha, resultado), na ordem de entrada.
+
+        Linhas inválidas (incompletas ou que não puderam ser lidas, ver InvalidRow) não são enviadas: o resultado
+        delas é uma falha com a lista de problemas em 'erro'.
+        Com fingerprint (ver input_fingerprint), linhas sem chaveIdempotencia recebem uma chave derivada do
+        arquivo, do número da linha e do conteúdo, para que a retomada reaproveite o que já foi registrado.
+        """
+        # Cada linha lida entra em 'entries'; as válidas seguem para o cliente, cujos resultados chegam na mesma ordem.
+        entries = deque()
+
+        def valid_rows():
+            for linha, row in enumerate(rows, start):
+                if isinstance(row, InvalidRow):
+                    entries.append((linha, {}, [row.erro]))
+                    continue
+                dados = self.mapper(row)
+                if fingerprint is not None and dados.get(KEY_FIELD) is None:
+                    dados[KEY_FIELD] = _row_key(fingerprint, linha, dados)
+                errors = validate_pre_post(dados)
+                entries.append((linha, dados, errors))
+                if not errors:
+                    yield dados
+
+        def invalid_head():
+            while entries and entries[0][2]:
+                linha, dados, errors = entries.popleft()
+                yield linha, self.client._pre_post_failure(idempotency_key(dados), ' '.join(errors))
+
+        for result in self.client.pre_post_obj_reg_iter(valid_rows(), max_workers=self.max_workers):
+            yield from invalid_head()
+            linha = entries.popleft()[0]
+            yield linha, result
+        yield from invalid_head()
+
+    def run(self, input_path, input_format=None):
+        """
+        Processa o arquivo de entrada, retomando do último checkpoint se houver um para o mesmo arquivo.
+
+        Returns:
+            dict: Totais desta execução ('linhas', 'sucesso', 'falha') e a linha em que ela começou ('retomado_em').
+        """
+        fingerprint = input_fingerprint(input_path)
+        checkpoint = self.load_checkpoint(input_path, fingerprint)
+        start = checkpoint['linha'] if checkpoint else 0
+        summary = {'linhas': 0, 'sucesso': 0, 'falha': 0, 'retomado_em': start}
+
+        mode = 'r+' if checkpoint and os.path.exists(self.output_path) else 'w'
+        with open(self.output_path, mode, encoding='utf-8', newline='') as output:
+            if checkpoint:
+                # Descarta o que foi gravado depois do último checkpoint; essas linhas serão processadas de novo.
+                output.seek(checkpoint['offset'])
+                output.truncate()
+            writer = None
+            if self.output_format == 'csv':
+                writer = csv.DictWriter(output, fieldnames=_RESULT_FIELDS)
+                if output.tell() == 0:
+                    writer.writeheader()
+
+            rows = islice(read_rows(input_path, input_format), start, None)
+            for linha, result in self.results(rows, start, fingerprint):
+                record = {'linha': linha}
+                record.update({field: result.get(field) for field in _RESULT_FIELDS[1:]})
+                if writer is not None:
+                    record['erro'] = None if record['erro'] is None else json.dumps(record['erro'], ensure_ascii=False)
+                    writer.writerow(record)
+                else:
+                    output.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+                summary['linhas'] += 1
+                summary['sucesso' if result['sucesso'] else 'falha'] += 1
+                if summary['linhas'] % self.checkpoint_every == 0:
+                    output.flush()
+                    os.fsync(output.fileno())
+                    self._save_checkpoint(input_path, fingerprint, linha + 1, output.tell())
+
+            output.flush()
+            os.fsync(output.fileno())
+            self._save_checkpoint(input_path, fingerprint, start + summary['linhas'], output.tell())
+        return summary
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import uuid
+
+# Campo opcional dos dados da pré-postagem com a chave de idempotência escolhida pelo chamador.
+KEY_FIELD = 'chaveIdempotencia'
+
+
+def idempotency_key(dados):
+    """
+    Retorna a chave de idempotência de uma pré-postagem: dados['chaveIdempotencia'] em texto, ou None.
+    """
+    key = dados.get(KEY_FIELD)
+    return None if key is None else str(key)
+
+
+def assign_idempotency_key(dados):
+    """
+    Retorna a chave de idempotência da pré-postagem, gerando uma se o item não tiver.
+
+    A chave gerada é aleatória (uuid4), e não derivada do conteúdo: dois pedidos com os mesmos dados são
+    pedidos diferentes. Ela é gravada em dados['chaveIdempotencia'], então reenviar o mesmo dicionário
+    (ou um com a chave devolvida no resultado) não registra o pedido de novo.
+    """
+    key = idempotency_key(dados)
+    if key is None:
+        key = uuid.uuid4().hex
+        dados[KEY_FIELD] = key
+    return key
+
+
+class MemoryPrePostRegistry:
+    """
+    Registro, em memória, das pré-postagens já criadas, por chave de idempotência.
+
+    Usado por pre_post_obj_reg_bulk para não registrar de novo um item que já foi aceito pela API
+    quando um lote é reenviado.
+    """
+
+    def __init__(self):
+        self._done = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna a resposta guardada para a chave (dict com 'codigoObjeto', ...), ou None."""
+        return self._done.get(key)
+
+    def set(self, key, resposta):
+        with self._lock:
+            self._done[key] = resposta
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+
+class FilePrePostRegistry(MemoryPrePostRegistry):
+    """
+    Registro de pré-postagens persistido em um arquivo JSON Lines, para sobreviver a reinícios.
+
+    Cada pré-postagem aceita é acrescentada ao final do arquivo como {"chave": ..., "resposta": ...},
+    então gravar não depende do tamanho do registro. Linhas incompletas (ex.: queda no meio da escrita)
+    são ignoradas na leitura.
+
+    Args:
+        path (str): Caminho do arquivo. É lido na criação e complementado a cada pré-postagem aceita.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._done[entry['chave']] = entry['resposta']
+        except OSError:
+            pass
+
+    def set(self, key, resposta):
+        line = json.dumps({'chave': key, 'resposta': resposta}, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._done[key] = resposta
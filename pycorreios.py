@@ -0,0 +1,339 @@
+"""
+Linha de comando para operações em massa na API dos Correios.
+
+    python pycorreios.py track    codigos.txt --type T --workers 8 > rastreio.jsonl
+    python pycorreios.py quote    pacotes.csv --workers 8 --format csv > precos.csv
+    python pycorreios.py forecast rotas.csv --produtos 03220,03298 > prazos.jsonl
+    python pycorreios.py prepost  pedidos.csv --workers 16 --registry registradas.jsonl --output resultados.jsonl
+    python pycorreios.py poll     codigos.txt --budget 120 --state rastreio.json >> novidades.jsonl
+
+A entrada pode ser um arquivo ou '-' (entrada padrão). Códigos de rastreamento vêm um por linha; pacotes, rotas e
+pedidos vêm em CSV (com cabeçalho) ou JSON Lines. Os resultados são escritos à medida que chegam, em JSON Lines
+(padrão) ou CSV, sem carregar a entrada inteira em memória.
+
+As credenciais vêm do arquivo .env (USER, ACESS_TOKEN, POST_CARD, N_CONTRACT), das variáveis de ambiente
+CORREIOS_USER, CORREIOS_ACESS_TOKEN, CORREIOS_POST_CARD e CORREIOS_CONTRACT, ou das opções --user, --acess-code,
+--post-card e --contract. O token é obtido (e renovado) automaticamente; um token já emitido só é usado se for
+passado em --token, pois um token guardado no .env pode estar vencido.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+from ApiClientCorreio import ApiClientCorreios
+from prepost_pipeline import InvalidRow, PrePostPipeline, read_rows, row_to_pre_post
+from prepost_registry import FilePrePostRegistry
+from tracking_poller import TrackingPoller
+from tracking_state import FileTrackingState
+from tracking_store import SQLiteTrackingStore
+
+try:
+    from dotenv import dotenv_values
+except ImportError:  # python-dotenv é opcional; sem ele o .env é lido de forma simplificada
+    dotenv_values = None
+
+_ENV_KEYS = {
+    'user': ('USER', 'CORREIOS_USER'),
+    'acess_code': ('ACESS_TOKEN', 'CORREIOS_ACESS_TOKEN'),
+    'post_card': ('POST_CARD', 'CORREIOS_POST_CARD'),
+    'contract': ('N_CONTRACT', 'CORREIOS_CONTRACT'),
+}
+
+
+def _read_env_file(path):
+    if not os.path.exists(path):
+        return {}
+    if dotenv_values is not None:
+        return dict(dotenv_values(path))
+    values = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                values[key.strip()] = value.strip().strip('"').strip("'")
+    return values
+
+
+def _credentials(args):
+    env_file = _read_env_file(args.env_file)
+    credentials = {}
+    for name, (file_key, env_key) in _ENV_KEYS.items():
+        value = getattr(args, name, None)
+        if value is None:
+            value = env_file.get(file_key) or os.environ.get(env_key)
+        credentials[name] = value
+    credentials['token'] = args.token
+    return credentials
+
+
+def _split(value):
+    if value is None or isinstance(value, list):
+        return value or []
+    return [x.strip() for x in str(value).replace('|', ';').replace(',', ';').split(';') if x.strip()]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _Writer:
+    # Escreve registros em JSON Lines ou CSV, descarregando a saída a cada flush_every registros.
+    def __init__(self, stream, output_format, fields, flush_every=50):
+        self.stream = stream
+        self.fields = fields
+        self.flush_every = flush_every
+        self.count = 0
+        self.csv = None
+        if output_format == 'csv':
+            self.csv = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+            self.csv.writeheader()
+
+    def write(self, record):
+        if self.csv is not None:
+            self.csv.writerow({k: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list)) else v
+                               for k, v in record.items()})
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.stream.flush()
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _tracking_codes(path):
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line in stream:
+            for code in line.replace(',', ' ').replace(';', ' ').split():
+                yield code
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _track_record(obj):
+    description = obj.get('description')
+    if not isinstance(description, list):
+        return {'codigo': obj.get('codigo'), 'mensagem': description, 'eventos': 0}
+    return {
+        'codigo': obj.get('codigo'),
+        'dtPrevista': obj.get('dtPrevista'),
+        'eventos': len(description),
+        'ultimo_evento': description[0] if description else None,
+        'dtEvento': obj['dtEvent'][0] if description else None,
+        'cidade': obj['cidade'][0] if description else None,
+        'uf': obj['uf'][0] if description else None,
+        'historico': obj,
+    }
+
+
+def cmd_track(client, args, writer_for):
+    writer = writer_for(('codigo', 'dtPrevista', 'eventos', 'ultimo_evento', 'dtEvento', 'cidade', 'uf', 'mensagem'))
+    for obj in client.tracking_package_iter(args.type, _tracking_codes(args.input), max_workers=args.workers):
+        record = _track_record(obj)
+        if args.format == 'csv':
+            record.pop('historico', None)
+        writer.write(record)
+    return writer
+
+
+def _shipment(row):
+    dados = dict(row)
+    dados['coProduto'] = _split(dados.get('coProduto'))
+    dados['servicosAdicionais'] = _split(dados.get('servicosAdicionais'))
+    return {k: v for k, v in dados.items() if v not in ('', None) or k in ('coProduto', 'servicosAdicionais')}
+
+
+def _shipment_error(client, shipment):
+    # Mesma validação que price_package_bulk faz com o catálogo, item a item, para não perder o lote inteiro.
+    try:
+        client.service_catalog.validate(shipment.get('coProduto'), shipment.get('servicosAdicionais'))
+    except ValueError as exc:
+        return str(exc)
+    return None
+
+
+def cmd_quote(client, args, writer_for):
+    writer = writer_for(('linha', 'cepOrigem', 'cepDestino', 'psObjeto', 'precos', 'erro'))
+    linha = 0
+    for chunk in _chunks(read_rows(args.input, args.input_format), args.chunk):
+        shipments = [_shipment(row) for row in chunk]
+        errors = [row.erro if isinstance(row, InvalidRow) else _shipment_error(client, shipment)
+                  for row, shipment in zip(chunk, shipments)]
+        # Só os pacotes válidos vão para a cotação em massa; os inválidos são reportados sem requisição.
+        valid = [shipment for shipment, error in zip(shipments, errors) if error is None]
+        prices = iter(client.price_package_bulk(valid, max_workers=args.workers) if valid else ())
+        for shipment, error in zip(shipments, errors):
+            record = {'linha': linha, 'cepOrigem': shipment.get('cepOrigem'), 'cepDestino': shipment.get('cepDestino'),
+                      'psObjeto': shipment.get('psObjeto'), 'precos': None if error else next(prices), 'erro': error}
+            if record['precos'] is None and error is None:
+                record['erro'] = 'Falha na cotação.'
+            writer.write(record)
+            linha += 1
+        writer.flush()
+    return writer
+
+
+def cmd_forecast(client, args, writer_for):
+    writer = writer_for(('linha', 'cepOrigem', 'cepDestino', 'dataPostagem', 'dtEvento', 'prazos', 'erro'))
+    produtos = _split(args.produtos)
+    linha = 0
+    for chunk in _chunks(read_rows(args.input, args.input_format), args.chunk):
+        routes = [(row.get('cepOrigem'), row.get('cepDestino'), row.get('dataPostagem'), row.get('dtEvento') or
+                   row.get('dataPostagem')) for row in chunk]
+        valid = [route for row, route in zip(chunk, routes) if not isinstance(row, InvalidRow)]
+        results = client.delivery_forecast_bulk(produtos, valid, max_workers=args.workers) if valid else {}
+        for row, route in zip(chunk, routes):
+            writer.write({'linha': linha, 'cepOrigem': route[0], 'cepDestino': route[1], 'dataPostagem': route[2],
+                          'dtEvento': route[3], 'prazos': results.get(tuple(route)),
+                          'erro': row.erro if isinstance(row, InvalidRow) else None})
+            linha += 1
+        writer.flush()
+    return writer
+
+
+def cmd_prepost(client, args, writer_for):
+    if args.output:
+        pipeline = PrePostPipeline(client, args.output, checkpoint_path=args.checkpoint, max_workers=args.workers)
+        summary = pipeline.run(args.input, args.input_format)
+        print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+        return None
+
+    writer = writer_for(('linha', 'chaveIdempotencia', 'sucesso', 'codigoObjeto', 'status', 'reaproveitado', 'erro'))
+    pipeline = PrePostPipeline(client, os.devnull, max_workers=args.workers, mapper=row_to_pre_post)
+    for linha, result in pipeline.results(read_rows(args.input, args.input_format)):
+        record = {'linha': linha}
+        record.update({k: result.get(k) for k in ('chaveIdempotencia', 'sucesso', 'codigoObjeto', 'status',
+                                                  'reaproveitado', 'erro')})
+        writer.write(record)
+    return writer
+
+
+def cmd_poll(client, args, writer_for):
+    # Roda até Ctrl+C; cada objeto com eventos novos (ou que chegou à situação final) vira um registro na saída.
+    writer = writer_for(('codigo', 'dtPrevista', 'eventos', 'ultimo_evento', 'dtEvento', 'cidade', 'uf', 'final'))
+
+    def emit(obj, final=False):
+        record = _track_record(obj)
+        record['final'] = final
+        if args.format == 'csv':
+            record.pop('historico', None)
+        writer.write(record)
+        writer.flush()
+
+    state = FileTrackingState(args.state) if args.state else None
+    poller = TrackingPoller(client, _tracking_codes(args.input), query_type=args.type, requests_per_minute=args.budget,
+                            max_workers=args.workers, state=state, on_update=emit,
+                            on_final=lambda obj: emit(obj, final=True))
+    try:
+        poller.run()
+    except KeyboardInterrupt:
+        poller.stop()
+    print(json.dumps(poller.stats(), ensure_ascii=False), file=sys.stderr)
+    return writer
+
+
+COMMANDS = {'track': cmd_track, 'quote': cmd_quote, 'forecast': cmd_forecast, 'prepost': cmd_prepost,
+            'poll': cmd_poll}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pycorreios', description='Operações em massa na API dos Correios.')
+    parser.add_argument('--env-file', default='.env', help='Arquivo .env com as credenciais.')
+    parser.add_argument('--user')
+    parser.add_argument('--acess-code', dest='acess_code')
+    parser.add_argument('--post-card', dest='post_card')
+    parser.add_argument('--contract')
+    parser.add_argument('--token', help='Token já emitido (opcional; senão é obtido e renovado automaticamente).')
+    parser.add_argument('--nudr', type=int, default=20, help='Número da DR do contrato.')
+    parser.add_argument('--base-url', help='URL base da API (ex.: servidor simulado dos benchmarks).')
+    parser.add_argument('--rate', type=float, help='Limite de requisições por segundo por endpoint.')
+
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('track', 'Rastreia códigos (um por linha).'),
+                            ('quote', 'Cota pacotes (CSV/JSONL no formato de price_package).'),
+                            ('forecast', 'Consulta prazos de rotas (cepOrigem, cepDestino, dataPostagem, dtEvento).'),
+                            ('prepost', 'Registra pré-postagens (CSV/JSONL no formato de pre_post_obj_reg).'),
+                            ('poll', 'Acompanha códigos continuamente, com agenda por código, até Ctrl+C.')):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('input', nargs='?', default='-', help="Arquivo de entrada ou '-' para a entrada padrão.")
+        cmd.add_argument('--input-format', choices=('csv', 'jsonl'))
+        cmd.add_argument('--format', choices=('jsonl', 'csv'), default='jsonl', help='Formato da saída.')
+        cmd.add_argument('--workers', type=int, default=8, help='Requisições simultâneas.')
+        if name in ('track', 'poll'):
+            cmd.add_argument('--type', default='T', choices=('T', 'U', 'P'), help='Tipo de resultado do rastreamento.')
+            cmd.add_argument('--store', help='Banco SQLite onde os objetos e eventos consultados são gravados.')
+        if name in ('quote', 'forecast'):
+            cmd.add_argument('--chunk', type=int, default=1000, help='Linhas lidas e enviadas por bloco.')
+        if name == 'forecast':
+            cmd.add_argument('--produtos', required=True, help='Códigos dos produtos, separados por vírgula.')
+        if name == 'poll':
+            cmd.add_argument('--budget', type=float, help='Orçamento de requisições de rastreamento por minuto.')
+            cmd.add_argument('--state', help='Arquivo com o último evento visto de cada código (sobrevive a reinícios).')
+        if name == 'prepost':
+            cmd.add_argument('--registry', help='Arquivo de idempotência (não registra de novo o que já foi aceito). '
+                                                'Com --output, o padrão é <output>.registry.jsonl.')
+            cmd.add_argument('--output', help='Arquivo de resultados com checkpoint (permite retomar após queda).')
+            cmd.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: <output>.checkpoint).')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, 'output', None) and args.input == '-':
+        parser.error('--output precisa de um arquivo de entrada (o checkpoint não funciona com a entrada padrão).')
+    credentials = _credentials(args)
+
+    options = {'pool_maxsize': max(10, args.workers)}
+    if getattr(args, 'store', None):
+        options['tracking_store'] = SQLiteTrackingStore(args.store)
+    registry = getattr(args, 'registry', None)
+    if registry is None and getattr(args, 'output', None):
+        # Com checkpoint a retomada reenvia as linhas após o último checkpoint; o registro em arquivo evita
+        # que elas virem etiquetas novas.
+        registry = args.output + '.registry.jsonl'
+    if registry:
+        options['pre_post_registry'] = FilePrePostRegistry(registry)
+    if args.rate:
+        from rate_limiter import RateLimiter
+        options['rate_limiter'] = RateLimiter(default=args.rate)
+
+    out = sys.stdout
+    client = ApiClientCorreios(credentials['user'], credentials['acess_code'], credentials['post_card'],
+                               credentials['contract'], credentials['token'], args.nudr, **options)
+    if args.base_url:
+        client.default_url = args.base_url.rstrip('/') + '/'
+
+    def writer_for(fields):
+        return _Writer(out, args.format, fields)
+
+    # As mensagens de erro do cliente vão para a saída de erros, para não misturar com os resultados.
+    try:
+        with client, contextlib.redirect_stdout(sys.stderr):
+            writer = COMMANDS[args.command](client, args, writer_for)
+        if writer is not None:
+            writer.flush()
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: '| head'); encerra em silêncio.
+        sys.stderr.close()
+    finally:
+        if 'tracking_store' in options:
+            options['tracking_store'].close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from cache import TTLCache
+
+# Campos de price_package que não alteram o preço de um produto e por isso ficam fora da chave.
+_IGNORED_FIELDS = ('coProduto', 'nuRequisicao', 'servicosAdicionais', 'vlDeclarado')
+
+
+def _digits(value):
+    return ''.join(c for c in str(value) if c.isdigit())
+
+
+def _number(value):
+    # '300', '300.0' e 300 geram a mesma chave.
+    try:
+        return str(Decimal(str(value).replace(',', '.')).normalize())
+    except InvalidOperation:
+        return str(value).strip()
+
+
+def _normalize(field, value):
+    if value is None:
+        return None
+    if field in ('cepOrigem', 'cepDestino'):
+        return _digits(value)
+    if field in ('psObjeto', 'altura', 'largura', 'comprimento', 'diametro', 'vlDeclarado'):
+        return _number(value)
+    return str(value).strip()
+
+
+def quote_signature(dados, coProduto):
+    """
+    Gera a chave normalizada de uma cotação de um produto.
+
+    CEPs ficam só com os dígitos, medidas e peso viram números normalizados, os serviços adicionais
+    são ordenados e o valor declarado só entra na chave quando 'VD' foi solicitado.
+
+    Args:
+        dados (dict): Os parâmetros no formato de price_package.
+        coProduto (str): O código do produto cotado.
+
+    Returns:
+        tuple: A chave da cotação.
+    """
+    adicionais = tuple(sorted(str(x).strip().upper() for x in dados.get('servicosAdicionais') or ()))
+    fields = tuple(sorted((k, _normalize(k, v)) for k, v in dados.items() if k not in _IGNORED_FIELDS))
+    vl_declarado = _normalize('vlDeclarado', dados.get('vlDeclarado')) if 'VD' in adicionais else None
+    return (str(coProduto).strip(), adicionais, vl_declarado, fields)
+
+
+def _end_of_day(dt_evento):
+    # dtEvento chega como 'dd/mm/aaaa' (ou 'aaaa-mm-dd'); a cotação vale até o fim desse dia.
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(str(dt_evento).strip()[:10], fmt) + timedelta(days=1)
+        except ValueError:
+            continue
+    return None
+
+
+class QuoteCache(TTLCache):
+    """
+    Cache das cotações de price_package, com um resultado por coProduto.
+
+    A chave é a assinatura normalizada da cotação (ver quote_signature), então carrinhos iguais escritos
+    de formas diferentes reaproveitam o mesmo preço. Cada entrada vale por ttl segundos, mas nunca além
+    do fim do dia de dtEvento. Os contadores hits/misses (e stats()) medem o aproveitamento.
+
+    Args:
+        maxsize (int): Quantidade máxima de preços guardados (LRU).
+        ttl (float): Validade máxima de cada preço, em segundos.
+
+    Exemplo:
+        >>> correios = ApiClientCorreios(..., quote_cache=QuoteCache(maxsize=20000, ttl=3600))
+        >>> correios.quote_cache.stats()
+        {'hits': 812, 'misses': 95, 'size': 95}
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+
+    def ttl_for(self, dados):
+        """Validade de uma cotação: o menor entre ttl e o tempo até o fim do dia de dtEvento."""
+        end = _end_of_day(dados.get('dtEvento'))
+        if end is None:
+            return self.ttl
+        remaining = (end - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return self.ttl
+        return min(self.ttl, remaining)
+
+    def lookup(self, dados):
+        """
+        Separa os produtos da cotação em acertos e faltas.
+
+        Returns:
+            tuple: (dicionário coProduto -> preço para os acertos, lista de coProduto que faltam).
+        """
+        hits = {}
+        misses = []
+        for prod in dados.get('coProduto') or ():
+            preco = self.get(quote_signature(dados, prod))
+            if preco is None:
+                misses.append(prod)
+            else:
+                hits[str(prod)] = preco
+        return hits, misses
+
+    def store(self, dados, resposta):
+        """Guarda os preços devolvidos pela API (itens sem preço não são guardados)."""
+        ttl = self.ttl_for(dados)
+        for item in resposta:
+            if item.get('preco') is not None:
+                self.set(quote_signature(dados, item.get('coProduto')), item.get('preco'), ttl=ttl)
+
+    @staticmethod
+    def merge(products, hits, resposta):
+        """Junta os preços do cache e os da API na ordem dos produtos pedidos."""
+        found = dict(hits)
+        for item in resposta:
+            found[str(item.get('coProduto'))] = item.get('preco')
+        return [{'coProduto': str(prod), 'preco': found[str(prod)]} for prod in products if str(prod) in found]
@@ -0,0 +1,179 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Endpoints da API, pelo primeiro segmento do caminho (srorastro = rastreamento).
+ENDPOINTS = ('srorastro', 'preco', 'prazo', 'prepostagem', 'token')
+
+_ALIASES = {'tracking': 'srorastro', 'rastro': 'srorastro', 'pre_postagem': 'prepostagem'}
+
+
+def endpoint_of(url, base_url=''):
+    """Retorna o nome do endpoint de uma URL da API ('srorastro', 'preco', 'prazo', 'prepostagem' ou 'token')."""
+    path = url[len(base_url):] if base_url and url.startswith(base_url) else url.split('://', 1)[-1].split('/', 1)[-1]
+    return path.lstrip('/').split('/', 1)[0].split('?', 1)[0]
+
+
+def parse_retry_after(value):
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos de espera, ou None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Balde de fichas (token bucket) seguro entre threads e corrotinas.
+
+    Libera até rate requisições por segundo, com rajadas de até burst. Cada chamada reserva a sua ficha sob
+    um lock e só então espera (time.sleep ou asyncio.sleep) o tempo devolvido, então threads e o cliente
+    assíncrono podem dividir o mesmo balde.
+
+    Ao receber 429 o ritmo cai pela metade (até min_rate) e o balde fica bloqueado pelo Retry-After;
+    a cada resposta bem-sucedida o ritmo volta a subir aos poucos até rate.
+
+    Args:
+        rate (float): Requisições por segundo.
+        burst (int, opcional): Tamanho máximo da rajada. Padrão é max(1, rate).
+        min_rate (float, opcional): Ritmo mínimo após reduções. Padrão é rate / 16.
+        recovery (float): Fração de rate recuperada a cada resposta bem-sucedida.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=None, recovery=0.05):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate))
+        self.min_rate = float(min_rate if min_rate is not None else self.rate / 16)
+        self.recovery = recovery
+        self.current_rate = self.rate
+        self.throttled = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserva uma ficha e retorna quantos segundos esperar antes de usar a requisição."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.current_rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.current_rate
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def async_acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        """Registra um 429: reduz o ritmo pela metade e, se informado, pausa o balde por retry_after segundos."""
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            # Vários 429 da mesma rajada (requisições já em andamento) contam como uma única redução.
+            if now >= self._cooldown_until:
+                self.current_rate = max(self.min_rate, self.current_rate / 2)
+                self._tokens = min(self._tokens, 0.0)
+                self._cooldown_until = now + max(retry_after or 0.0, 1.0 / self.current_rate)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def relax(self):
+        """Registra uma resposta bem-sucedida: recupera parte do ritmo perdido."""
+        if self.current_rate >= self.rate:
+            return
+        with self._lock:
+            self.current_rate = min(self.rate, self.current_rate + self.rate * self.recovery)
+
+
+class RateLimiter:
+    """
+    Limitador de requisições por endpoint, compartilhável entre clientes, threads e o cliente assíncrono.
+
+    Cada endpoint ('srorastro', 'preco', 'prazo', 'prepostagem', 'token') tem o seu TokenBucket; endpoints
+    sem limite configurado não são limitados. Respostas 429 reduzem o ritmo do endpoint e respeitam o
+    cabeçalho Retry-After.
+
+    Args:
+        limits (dict, opcional): Endpoint -> requisições por segundo, ou (requisições por segundo, rajada).
+            'tracking' é aceito como sinônimo de 'srorastro'.
+        default (float ou tuple, opcional): Limite dos endpoints não listados em limits.
+
+    Exemplo:
+        >>> limiter = RateLimiter({'srorastro': 20, 'preco': (10, 20), 'prepostagem': 5}, default=10)
+        >>> correios = ApiClientCorreios(..., rate_limiter=limiter)
+        >>> outro = AsyncApiClientCorreios(..., rate_limiter=limiter)
+    """
+
+    def __init__(self, limits=None, default=None):
+        self.default = default
+        self._buckets = {}
+        self._lock = threading.Lock()
+        for endpoint, limit in (limits or {}).items():
+            self._buckets[_ALIASES.get(endpoint, endpoint)] = self._bucket(limit)
+
+    @staticmethod
+    def _bucket(limit):
+        if isinstance(limit, TokenBucket):
+            return limit
+        if isinstance(limit, (tuple, list)):
+            return TokenBucket(*limit)
+        return TokenBucket(limit)
+
+    def bucket(self, endpoint):
+        """Retorna o TokenBucket do endpoint, ou None se ele não é limitado."""
+        endpoint = _ALIASES.get(endpoint, endpoint)
+        bucket = self._buckets.get(endpoint)
+        if bucket is None and self.default is not None:
+            with self._lock:
+                bucket = self._buckets.get(endpoint)
+                if bucket is None:
+                    bucket = self._buckets[endpoint] = self._bucket(self.default)
+        return bucket
+
+    def acquire(self, endpoint):
+        """Espera (bloqueando a thread) até que uma requisição ao endpoint possa ser feita."""
+        bucket = self.bucket(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+
+    async def async_acquire(self, endpoint):
+        """Versão assíncrona de acquire."""
+        bucket = self.bucket(endpoint)
+        if bucket is not None:
+            await bucket.async_acquire()
+
+    def feedback(self, endpoint, status_code, headers=None):
+        """Ajusta o ritmo do endpoint conforme a resposta: 429 (e 503 com Retry-After) reduz, sucesso recupera."""
+        bucket = self.bucket(endpoint)
+        if bucket is None:
+            return
+        retry_after = parse_retry_after((headers or {}).get('Retry-After'))
+        if status_code == 429 or (status_code == 503 and retry_after is not None):
+            bucket.throttle(retry_after)
+        elif status_code < 400:
+            bucket.relax()
+
+    def stats(self):
+        """Retorna, por endpoint, o ritmo configurado, o ritmo atual e quantos 429 foram recebidos."""
+        return {endpoint: {'rate': bucket.rate, 'current_rate': bucket.current_rate, 'throttled': bucket.throttled}
+                for endpoint, bucket in self._buckets.items()}
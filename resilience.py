@@ -0,0 +1,157 @@
+import json
+import random
+import threading
+import time
+
+# Endpoints cujas chamadas podem ser repetidas sem efeito colateral. A pré-postagem cria um objeto a cada
+# chamada, então só é repetida quando a API recusa a requisição sem processá-la (429).
+IDEMPOTENT_ENDPOINTS = ('srorastro', 'preco', 'prazo', 'token')
+
+
+class RetryPolicy:
+    """
+    Política de novas tentativas com backoff exponencial e jitter ("full jitter").
+
+    A espera antes da tentativa n (começando em 1) é sorteada entre 0 e min(max_delay, base_delay * 2 ** (n - 1));
+    um Retry-After da API é respeitado se não passar de max_delay.
+
+    Args:
+        max_attempts (int): Quantidade máxima de tentativas, incluindo a primeira.
+        base_delay (float): Espera base, em segundos.
+        max_delay (float): Espera máxima entre tentativas, em segundos.
+        retry_statuses (tuple): Códigos HTTP que geram nova tentativa.
+        idempotent_endpoints (tuple): Endpoints repetidos também em erros 5xx e falhas de conexão.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=10.0, retry_statuses=(429, 500, 502, 503, 504),
+                 idempotent_endpoints=IDEMPOTENT_ENDPOINTS):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = retry_statuses
+        self.idempotent_endpoints = idempotent_endpoints
+
+    def backoff(self, attempt, retry_after=None):
+        """Retorna a espera, em segundos, antes da próxima tentativa (attempt = tentativas já feitas), ou None."""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, endpoint, attempt, status_code=None):
+        """Indica se a chamada deve ser repetida; status_code None representa uma falha de conexão ou timeout."""
+        if attempt >= self.max_attempts:
+            return False
+        if status_code == 429:
+            return True
+        if endpoint not in self.idempotent_endpoints:
+            return False
+        return status_code is None or status_code in self.retry_statuses
+
+
+class CircuitBreaker:
+    """
+    Disjuntor de um endpoint: após failure_threshold falhas seguidas (5xx, timeout ou erro de conexão) ele abre
+    e as chamadas falham na hora, sem ir à rede, por reset_timeout segundos. Depois disso uma chamada de teste
+    é liberada (meio-aberto): se der certo o disjuntor fecha, se falhar volta a abrir.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Indica se uma chamada pode ser feita agora."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self):
+        """Segundos até o disjuntor liberar a próxima chamada de teste."""
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class CircuitBreakers:
+    """
+    Um CircuitBreaker por endpoint ('srorastro', 'preco', 'prazo', 'prepostagem', 'token'), criado sob demanda.
+
+    Args:
+        failure_threshold (int): Falhas seguidas que abrem o disjuntor de um endpoint.
+        reset_timeout (float): Segundos que o disjuntor fica aberto antes da chamada de teste.
+
+    Exemplo:
+        >>> breakers = CircuitBreakers(failure_threshold=10, reset_timeout=60)
+        >>> correios = ApiClientCorreios(..., circuit_breaker=breakers)
+        >>> breakers.stats()
+        {'srorastro': {'state': 'open', 'failures': 10, 'opened': 1}}
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint):
+        breaker = self._breakers.get(endpoint)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(endpoint)
+                if breaker is None:
+                    breaker = self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    def stats(self):
+        return {endpoint: {'state': b.state, 'failures': b.failures, 'opened': b.opened}
+                for endpoint, b in self._breakers.items()}
+
+
+class CircuitOpenResponse:
+    """
+    Resposta devolvida sem ir à rede quando o disjuntor do endpoint está aberto (status 503), para que os
+    métodos do cliente a tratem como qualquer outra falha da API.
+    """
+
+    status_code = 503
+
+    def __init__(self, endpoint, retry_in):
+        self.endpoint = endpoint
+        self.headers = {'Retry-After': str(int(retry_in) + 1)}
+        self._body = {'msgs': [f"Endpoint '{endpoint}' indisponível (circuito aberto); nova tentativa em {retry_in:.0f}s."]}
+        self.content = json.dumps(self._body, ensure_ascii=False).encode('utf-8')
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return self._body
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
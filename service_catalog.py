@@ -0,0 +1,146 @@
+import json
+import threading
+
+import data_defaults as data_c
+
+
+def _code(value):
+    return str(value).strip()
+
+
+def _sigla(value):
+    return str(value).strip().upper()
+
+
+class ServiceCatalog:
+    """
+    Catálogo indexado dos produtos (serviços) dos Correios e dos seus serviços adicionais.
+
+    Substitui a busca linear em data_defaults.servicos: os produtos ficam indexados pelo código e pelo nome,
+    e os serviços adicionais de cada produto pela sigla ('AR', 'MP', 'VD', ...) e pelo código ('001', ...).
+    Siglas desconhecidas são recusadas antes de qualquer requisição, em vez de virarem None no payload.
+
+    O catálogo pode ser carregado ou recarregado de um arquivo JSON no mesmo formato de data_defaults.servicos
+    (lista de {"cod", "nome", "servicos_adicionais"}), para catálogos específicos de um contrato.
+
+    Args:
+        services (list, opcional): Lista de produtos. Padrão é data_defaults.servicos.
+
+    Exemplo:
+        >>> catalogo = ServiceCatalog.from_json('servicos_contrato.json')
+        >>> catalogo.additional_codes('03298', ['AR', 'VD'])
+        ['001', '064']
+        >>> correios = ApiClientCorreios(..., service_catalog=catalogo)
+    """
+
+    def __init__(self, services=None):
+        self._lock = threading.Lock()
+        self._load(data_c.servicos if services is None else services)
+
+    @classmethod
+    def from_json(cls, path):
+        """Cria o catálogo a partir de um arquivo JSON."""
+        return cls(cls._read(path))
+
+    @staticmethod
+    def _read(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            services = json.load(f)
+        if isinstance(services, dict):
+            services = services.get('servicos', [])
+        return services
+
+    def refresh(self, path=None, services=None):
+        """
+        Substitui o conteúdo do catálogo pelo de um arquivo JSON ou de uma lista de produtos.
+
+        A troca é atômica: consultas simultâneas enxergam o catálogo antigo ou o novo, nunca uma mistura.
+        """
+        if path is not None:
+            services = self._read(path)
+        if services is None:
+            raise ValueError("Informe o caminho do arquivo JSON ou a lista de serviços.")
+        self._load(services)
+
+    def _load(self, services):
+        products = {}
+        names = {}
+        for service in services:
+            cod = _code(service['cod'])
+            adicionais = {_sigla(sigla): _code(codigo)
+                          for sigla, codigo in (service.get('servicos_adicionais') or {}).items()}
+            product = {
+                'cod': cod,
+                'nome': service.get('nome'),
+                'servicos_adicionais': adicionais,
+                'siglas': {codigo: sigla for sigla, codigo in adicionais.items()},
+            }
+            products[cod] = product
+            if product['nome']:
+                names[product['nome'].strip().upper()] = product
+        with self._lock:
+            self._products, self._names = products, names
+
+    def __len__(self):
+        return len(self._products)
+
+    def __contains__(self, cod):
+        return _code(cod) in self._products
+
+    def __iter__(self):
+        return iter(list(self._products.values()))
+
+    def get(self, cod):
+        """Retorna o produto pelo código (dict com 'cod', 'nome' e 'servicos_adicionais'), ou None."""
+        return self._products.get(_code(cod))
+
+    def by_name(self, nome):
+        """Retorna o produto pelo nome (sem diferenciar maiúsculas), ou None."""
+        return self._names.get(str(nome).strip().upper())
+
+    def product(self, cod):
+        """Como get, mas lança ValueError se o produto não estiver no catálogo."""
+        product = self.get(cod)
+        if product is None:
+            raise ValueError(f"Produto '{cod}' não encontrado no catálogo de serviços.")
+        return product
+
+    def additional_code(self, cod, sigla):
+        """Retorna o código do serviço adicional (ex.: 'VD' -> '019') do produto; ValueError se não existir."""
+        codigo = self.product(cod)['servicos_adicionais'].get(_sigla(sigla))
+        if codigo is None:
+            raise ValueError(f"Serviço adicional '{sigla}' não disponível para o produto '{cod}'.")
+        return codigo
+
+    def additional_codes(self, cod, siglas):
+        """Retorna os códigos de uma lista de siglas de serviços adicionais do produto."""
+        return [self.additional_code(cod, sigla) for sigla in siglas or ()]
+
+    def additional_name(self, cod, codigo):
+        """Busca reversa: retorna a sigla de um código de serviço adicional do produto, ou None."""
+        product = self.get(cod)
+        if product is None:
+            return None
+        return product['siglas'].get(_code(codigo))
+
+    def validate(self, products, siglas=()):
+        """
+        Verifica, antes de qualquer requisição, se todos os produtos existem e aceitam os serviços adicionais.
+
+        Raises:
+            ValueError: Com a lista de todos os problemas encontrados.
+        """
+        errors = []
+        for cod in products or ():
+            product = self.get(cod)
+            if product is None:
+                errors.append(f"Produto '{cod}' não encontrado no catálogo de serviços.")
+                continue
+            for sigla in siglas or ():
+                if _sigla(sigla) not in product['servicos_adicionais']:
+                    errors.append(f"Serviço adicional '{sigla}' não disponível para o produto '{cod}'.")
+        if errors:
+            raise ValueError(' '.join(errors))
+
+
+default_catalog = ServiceCatalog()
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas idênticas em andamento: enquanto a primeira chamada de uma chave não termina,
+    as demais threads com a mesma chave esperam e recebem o mesmo resultado (ou a mesma exceção),
+    sem repetir a requisição.
+
+    Exemplo:
+        >>> inflight = SingleFlight()
+        >>> inflight.do(('preco', payload), lambda: enviar(payload))
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Executa fn() ou, se outra thread já estiver executando a mesma chave, espera pelo resultado dela.
+
+        Args:
+            key: Chave que identifica a requisição (deve ser hashable).
+            fn (callable): Função sem argumentos que faz a requisição.
+
+        Returns:
+            O valor retornado por fn(); threads que esperaram recebem o mesmo objeto.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Versão asyncio do SingleFlight, para o AsyncApiClientCorreios."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """
+        Aguarda fn() ou, se outra corrotina já estiver aguardando a mesma chave, o resultado dela.
+
+        Args:
+            key: Chave que identifica a requisição.
+            fn (callable): Função sem argumentos que retorna a corrotina da requisição.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_event_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            future.exception()  # evita o aviso de exceção não lida quando ninguém mais esperava
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def __len__(self):
+        return len(self._calls)
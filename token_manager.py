@@ -0,0 +1,262 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+# Fuso das datas devolvidas sem fuso pela API: horário de Brasília (UTC-3, sem horário de verão desde 2019).
+BRASILIA = timezone(timedelta(hours=-3), 'America/Sao_Paulo')
+
+
+def to_brasilia(value):
+    """
+    Converte um datetime com fuso para o horário de Brasília sem fuso, o mesmo formato das datas da API.
+    Datetimes sem fuso (já no horário de Brasília) e None passam sem alteração.
+    """
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(BRASILIA).replace(tzinfo=None)
+    return value
+
+
+def brasilia_now():
+    """Horário atual de Brasília, sem fuso, comparável com as datas da API independentemente do fuso do host."""
+    return datetime.now(BRASILIA).replace(tzinfo=None)
+
+
+def parse_correios_datetime(value):
+    """
+    Converte as datas devolvidas pela API (ex.: 'emissao' e 'expiraEm' do token, 'dtHrCriado' dos eventos) em datetime.
+
+    Args:
+        value (str): Data no formato ISO 8601 (ex.: '2024-04-06T11:33:29'), com ou sem fuso.
+
+    Returns:
+        datetime or None: A data convertida, ou None se o valor estiver vazio ou em formato desconhecido.
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    value = str(value).strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    # Python 3.8 não aceita frações de segundo com tamanho diferente de 3 ou 6 dígitos.
+    if '.' in value:
+        head, _, tail = value.partition('.')
+        digits = ''.join(c for c in tail if c.isdigit())
+        zone = tail[len(digits):]
+        try:
+            return datetime.fromisoformat(f'{head}.{digits[:6].ljust(6, "0")}{zone}')
+        except ValueError:
+            return None
+    return None
+
+
+class TokenManager:
+    """
+    Guarda um token por modo de autenticação ('cartao_postagem', 'contrato' ou '') junto da sua validade
+    e renova o token pouco antes de expirar.
+
+    A renovação é single-flight: se várias threads precisarem de um token vencido ao mesmo tempo,
+    apenas uma faz a chamada de autenticação e as demais reaproveitam o resultado.
+
+    Com um store (ex.: token_store.FileTokenStore) o token também é compartilhado entre processos:
+    antes de autenticar, o gerenciador consulta o store sob lock e só chama a API se não houver token válido.
+
+    Args:
+        refresh_margin (float): Segundos antes de 'expiraEm' a partir dos quais o token já é renovado.
+        store (FileTokenStore, opcional): Cache persistente de tokens compartilhado entre processos.
+        namespace (str): Identifica as credenciais (usuário, cartão, contrato) na chave do store.
+    """
+
+    def __init__(self, refresh_margin=300, store=None, namespace=''):
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.store = store
+        self.namespace = namespace
+        self._tokens = {}
+        self._generations = {}
+        self._rejected = {}
+        self._locks = {}
+        self._async_locks = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, mode):
+        with self._guard:
+            if mode not in self._locks:
+                self._locks[mode] = threading.Lock()
+            return self._locks[mode]
+
+    def _async_lock(self, mode):
+        if mode not in self._async_locks:
+            self._async_locks[mode] = asyncio.Lock()
+        return self._async_locks[mode]
+
+    @staticmethod
+    def _now(expires_at):
+        if expires_at.tzinfo is not None:
+            return datetime.now(timezone.utc)
+        return datetime.now()
+
+    def is_fresh(self, entry):
+        """
+        Indica se o token ainda pode ser usado sem renovação.
+        Tokens sem 'expiraEm' conhecido são considerados válidos.
+        """
+        if not entry or not entry.get('token'):
+            return False
+        expires_at = entry.get('expires_at')
+        if expires_at is None:
+            return True
+        return self._now(expires_at) < expires_at - self.refresh_margin
+
+    def get(self, mode):
+        """Retorna o token guardado para o modo (mesmo que vencido), ou None."""
+        return self._tokens.get(mode)
+
+    def set(self, mode, token_json):
+        """
+        Guarda a resposta da API de token para o modo informado.
+
+        Args:
+            mode (str): O modo de autenticação.
+            token_json (dict): Resposta da API contendo 'token', 'emissao' e 'expiraEm'.
+
+        Returns:
+            dict: A entrada guardada, com as chaves 'token', 'emissao', 'expiraEm' e 'expires_at'.
+        """
+        entry = {
+            'token': token_json.get('token'),
+            'emissao': token_json.get('emissao'),
+            'expiraEm': token_json.get('expiraEm'),
+            'expires_at': parse_correios_datetime(token_json.get('expiraEm')),
+        }
+        self._tokens[mode] = entry
+        self._generations[mode] = self._generations.get(mode, 0) + 1
+        return entry
+
+    def invalidate(self, mode=None, token=None):
+        """
+        Descarta o token do modo informado (ou de todos os modos, se mode for None).
+
+        Com token (o token recusado pela API), o descarte só acontece se ele ainda for o token guardado:
+        quando várias requisições recebem 401 ao mesmo tempo, o token renovado pela primeira é mantido.
+        O token recusado também deixa de ser aproveitado do store.
+        """
+        if mode is None:
+            self._tokens.clear()
+            return
+        entry = self._tokens.get(mode)
+        if token is None or (entry is not None and entry.get('token') == token):
+            self._tokens.pop(mode, None)
+        if token is not None:
+            self._rejected[mode] = token
+
+    def token(self, mode, fetch):
+        """
+        Retorna um token válido para o modo, renovando-o apenas se estiver perto de expirar.
+
+        Args:
+            mode (str): O modo de autenticação.
+            fetch (callable): Função sem argumentos que chama a API de token e retorna o JSON da resposta,
+                ou None em caso de erro.
+
+        Returns:
+            dict or None: A entrada do token, ou None se a renovação falhar.
+        """
+        entry = self._tokens.get(mode)
+        if self.is_fresh(entry):
+            return entry
+        return self.refresh(mode, fetch, force=False)
+
+    def refresh(self, mode, fetch, force=True):
+        """
+        Renova o token do modo informado.
+
+        Chamadas simultâneas são agrupadas: quem chega enquanto outra thread renova o mesmo modo
+        espera e recebe o token recém emitido, sem uma nova chamada de autenticação.
+
+        Args:
+            mode (str): O modo de autenticação.
+            fetch (callable): Função sem argumentos que retorna o JSON da API de token, ou None.
+            force (bool): Se False, não renova um token que ainda esteja válido.
+
+        Returns:
+            dict or None: A entrada do token, ou None se a renovação falhar.
+        """
+        generation = self._generations.get(mode, 0)
+        with self._lock(mode):
+            entry = self._tokens.get(mode)
+            if self.is_fresh(entry) and (not force or self._generations.get(mode, 0) != generation):
+                return entry
+            if self.store is None:
+                token_json = fetch()
+                if token_json is None:
+                    return None
+                return self.set(mode, token_json)
+            return self._refresh_from_store(mode, fetch, entry, force)
+
+    def _refresh_from_store(self, mode, fetch, entry, force):
+        key = self.store.key(self.namespace, mode)
+        with self.store.locked():
+            candidate = self._stored_candidate(mode, key, entry, force)
+            if candidate is not None:
+                return candidate
+            token_json = fetch()
+            if token_json is None:
+                return None
+            self.store.save(key, token_json)
+            return self.set(mode, token_json)
+
+    def _stored_candidate(self, mode, key, entry, force):
+        # Retorna o token do store se puder ser reaproveitado. Deve ser chamado com o store travado.
+        stored = self.store.load(key)
+        if stored is None or stored.get('token') == self._rejected.get(mode):
+            return None
+        candidate = self.set(mode, stored)
+        # Em uma renovação forçada, só aproveita o token se outro processo já o renovou.
+        renewed = entry is None or candidate['token'] != entry.get('token')
+        if self.is_fresh(candidate) and (not force or renewed):
+            return candidate
+        return None
+
+    async def async_token(self, mode, fetch):
+        """
+        Versão assíncrona de token(), para o AsyncApiClientCorreios.
+
+        Args:
+            mode (str): O modo de autenticação.
+            fetch (callable): Função sem argumentos que retorna uma corrotina com o JSON da API de token, ou None.
+        """
+        entry = self._tokens.get(mode)
+        if self.is_fresh(entry):
+            return entry
+        return await self.async_refresh(mode, fetch, force=False)
+
+    async def async_refresh(self, mode, fetch, force=True):
+        """
+        Versão assíncrona de refresh(): corrotinas que pedem o mesmo modo ao mesmo tempo aguardam uma única autenticação.
+
+        Com store, o lock de arquivo não é mantido durante a chamada à API (isso bloquearia o event loop);
+        o store é consultado antes e atualizado depois da autenticação.
+        """
+        generation = self._generations.get(mode, 0)
+        async with self._async_lock(mode):
+            entry = self._tokens.get(mode)
+            if self.is_fresh(entry) and (not force or self._generations.get(mode, 0) != generation):
+                return entry
+            if self.store is not None:
+                key = self.store.key(self.namespace, mode)
+                with self.store.locked():
+                    candidate = self._stored_candidate(mode, key, entry, force)
+                if candidate is not None:
+                    return candidate
+            token_json = await fetch()
+            if token_json is None:
+                return None
+            if self.store is not None:
+                with self.store.locked():
+                    self.store.save(key, token_json)
+            return self.set(mode, token_json)
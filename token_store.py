@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileTokenStore:
+    """
+    Cache de tokens compartilhado entre processos, gravado em um arquivo JSON protegido por lock de arquivo.
+
+    Processos no mesmo host que usam o mesmo arquivo reaproveitam o token válido até 'expiraEm';
+    quando ele vence, o primeiro processo a obter o lock faz a renovação e os demais leem o token novo.
+
+    Args:
+        path (str): Caminho do arquivo JSON. Um arquivo '<path>.lock' é criado ao lado dele para o lock.
+
+    Exemplo:
+        >>> store = FileTokenStore('/var/tmp/correios_tokens.json')
+        >>> correios = ApiClientCorreios(user, acess_code, post_card, contract, None, 20, token_store=store)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+
+    @staticmethod
+    def key(*parts):
+        """Gera a chave de um token (usuário, cartão de postagem, contrato, modo) sem gravar os dados em claro."""
+        raw = '|'.join('' if p is None else str(p) for p in parts)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @contextmanager
+    def locked(self):
+        """Mantém o lock exclusivo do arquivo enquanto o bloco with estiver em execução."""
+        with open(self.lock_path, 'a+b') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield self
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def read(self):
+        """Lê todos os tokens do arquivo. Deve ser chamado dentro de locked()."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, data):
+        """Grava todos os tokens de forma atômica. Deve ser chamado dentro de locked()."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tokens-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def load(self, key):
+        """Retorna o token guardado para a chave ('token', 'emissao', 'expiraEm'), ou None."""
+        return self.read().get(key)
+
+    def save(self, key, token_json):
+        """Guarda o token para a chave, mantendo os tokens das demais chaves."""
+        data = self.read()
+        data[key] = {x: token_json.get(x) for x in ('token', 'emissao', 'expiraEm')}
+        self.write(data)
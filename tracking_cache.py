@@ -0,0 +1,84 @@
+from cache import TTLCache
+
+# Descrições de eventos após os quais o objeto não muda mais de situação.
+FINAL_DESCRIPTIONS = (
+    'Objeto entregue ao destinatário',
+    'Objeto entregue ao remetente',
+)
+
+
+def normalize_code(code):
+    """Normaliza um código de rastreamento para comparação (sem espaços, em maiúsculas)."""
+    return str(code).strip().upper()
+
+
+def is_final(tracking_object, final_descriptions=FINAL_DESCRIPTIONS):
+    """
+    Indica se o último evento de um objeto (no formato de tracking_package) é final, ou seja, entregue ou devolvido.
+
+    A API devolve os eventos do mais recente para o mais antigo, então o último evento é o primeiro da lista.
+    """
+    description = tracking_object.get('description')
+    if not isinstance(description, list) or not description:
+        return False
+    last = description[0] or ''
+    return any(last.startswith(final) for final in final_descriptions)
+
+
+class TrackingCache(TTLCache):
+    """
+    Cache dos resultados de tracking_package, por (código, query_type).
+
+    Objetos cujo último evento é final (entregue ou devolvido ao remetente) usam final_ttl, que por padrão
+    não expira; os demais usam ttl. O tamanho é limitado por maxsize (LRU).
+
+    Args:
+        maxsize (int): Quantidade máxima de objetos guardados.
+        ttl (float): Validade, em segundos, de objetos ainda em movimento.
+        final_ttl (float or None): Validade de objetos em situação final. None fixa o objeto no cache.
+        final_descriptions (tuple): Descrições de eventos considerados finais.
+
+    Exemplo:
+        >>> correios = ApiClientCorreios(..., tracking_cache=TrackingCache(maxsize=50000, ttl=120))
+    """
+
+    def __init__(self, maxsize=10000, ttl=300, final_ttl=None, final_descriptions=FINAL_DESCRIPTIONS):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.final_ttl = final_ttl
+        self.final_descriptions = final_descriptions
+
+    def lookup(self, query_type, tracking_codes):
+        """
+        Separa os códigos em acertos e faltas.
+
+        Returns:
+            tuple: (dicionário código normalizado -> objeto para os acertos, lista de códigos que faltam).
+        """
+        hits = {}
+        misses = []
+        seen = set()
+        for code in tracking_codes:
+            key = normalize_code(code)
+            if key in seen:
+                continue
+            seen.add(key)
+            cached = self.get((key, query_type))
+            if cached is None:
+                misses.append(code)
+            else:
+                hits[key] = cached
+        return hits, misses
+
+    def store(self, query_type, tracking_objects):
+        """Guarda os objetos recém consultados, com validade conforme a situação de cada um."""
+        for tracking_object in tracking_objects:
+            ttl = self.final_ttl if is_final(tracking_object, self.final_descriptions) else self.ttl
+            self.set((normalize_code(tracking_object.get('codigo')), query_type), tracking_object, ttl=ttl)
+
+    @staticmethod
+    def merge(tracking_codes, hits, tracking_objects):
+        """Junta acertos do cache e objetos consultados na ordem dos códigos de entrada."""
+        found = dict(hits)
+        for tracking_object in tracking_objects:
+            found[normalize_code(tracking_object.get('codigo'))] = tracking_object
+        return [found[normalize_code(code)] for code in tracking_codes if normalize_code(code) in found]
@@ -0,0 +1,312 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from rate_limiter import TokenBucket
+from token_manager import BRASILIA, parse_correios_datetime, to_brasilia
+from tracking_cache import FINAL_DESCRIPTIONS, is_final, normalize_code
+from tracking_state import MemoryTrackingState
+
+# Intervalo entre consultas (segundos) conforme a situação do objeto na última consulta.
+DEFAULT_INTERVALS = {
+    'out_for_delivery': 15 * 60,    # último evento é a saída para entrega
+    'overdue': 30 * 60,             # dtPrevista já passou
+    'due_soon': 60 * 60,            # dtPrevista nas próximas 24 horas
+    'recent': 2 * 60 * 60,          # último evento há menos de 24 horas
+    'idle': 6 * 60 * 60,            # sem eventos novos há mais de 24 horas
+    'not_found': 12 * 60 * 60,      # código ainda sem eventos (ex.: etiqueta não postada)
+    'error': 5 * 60,                # a consulta do lote falhou ou o código não veio na resposta
+}
+
+AUTH_ERRORS = (401, 403)
+
+OUT_FOR_DELIVERY = 'Objeto saiu para entrega'
+
+
+def _local(value):
+    # Datas da API vêm sem fuso (horário de Brasília); as com fuso são convertidas para o mesmo horário.
+    return to_brasilia(parse_correios_datetime(value))
+
+
+def poll_interval(tracking_object, now, intervals=DEFAULT_INTERVALS, final_descriptions=FINAL_DESCRIPTIONS):
+    """
+    Calcula em quantos segundos o objeto deve ser consultado de novo.
+
+    Args:
+        tracking_object (dict): Objeto no formato de tracking_package.
+        now (datetime): Horário da consulta (horário de Brasília, sem fuso).
+        intervals (dict): Intervalos por situação, como em DEFAULT_INTERVALS.
+
+    Returns:
+        float or None: Segundos até a próxima consulta, ou None se o objeto chegou a uma situação final.
+    """
+    if is_final(tracking_object, final_descriptions):
+        return None
+    description = tracking_object.get('description')
+    if not isinstance(description, list) or not description:
+        return intervals['not_found']
+    if (description[0] or '').startswith(OUT_FOR_DELIVERY):
+        return intervals['out_for_delivery']
+
+    expected = _local(tracking_object.get('dtPrevista'))
+    if expected is not None:
+        if now >= expected:
+            return intervals['overdue']
+        if expected - now <= timedelta(days=1):
+            return intervals['due_soon']
+
+    last_event = _local((tracking_object.get('dtEvent') or [None])[0])
+    if last_event is not None and now - last_event <= timedelta(days=1):
+        return intervals['recent']
+    return intervals['idle']
+
+
+class TrackingPoller:
+    """
+    Consulta contínua de uma carteira de códigos, com agenda própria para cada código.
+
+    Cada código tem um horário da próxima consulta, calculado por poll_interval a partir do último evento e
+    de dtPrevista: objetos saindo para entrega ou atrasados são consultados com frequência, objetos parados
+    raramente, e objetos entregues ou devolvidos saem da agenda. Os códigos vencidos são agrupados em
+    requisições cheias (tracking_limit códigos, completadas com os que vencem em até fill_ahead segundos) e, com
+    requests_per_minute, o poller nunca passa do orçamento de requisições (os lotes são enviados sem as novas
+    tentativas do cliente; um lote que falha é reagendado); quando há mais códigos vencidos
+    do que o orçamento permite, os mais atrasados vão primeiro. Se o cliente tiver um tracking_store, cada
+    objeto consultado é gravado nele.
+
+    Args:
+        client (ApiClientCorreios): Cliente usado nas consultas.
+        codes (iterable, opcional): Códigos iniciais, agendados para consulta imediata.
+        query_type (str): 'U', 'T' ou 'P', como em tracking_package.
+        requests_per_minute (float, opcional): Orçamento de requisições de rastreamento. None não limita.
+        max_workers (int): Quantidade de requisições em andamento ao mesmo tempo.
+        intervals (dict, opcional): Intervalos por situação; as chaves ausentes usam DEFAULT_INTERVALS.
+        fill_ahead (float): Requisições com menos de tracking_limit códigos vencidos são completadas com os códigos
+            que vencem nos próximos fill_ahead segundos, sem custo de requisições extras. 0 desativa.
+        state (MemoryTrackingState or FileTrackingState, opcional): Último evento visto de cada código,
+            usado para entregar a on_update apenas os eventos novos.
+        on_update (callable, opcional): Chamado com cada objeto que teve eventos novos (só os eventos novos).
+        on_final (callable, opcional): Chamado com o objeto completo quando ele sai da agenda.
+        final_descriptions (tuple): Descrições de eventos considerados finais.
+        max_auth_failures (int): Consultas seguidas recusadas por autenticação (401/403, mesmo com o token renovado
+            a cada recusa) a partir das quais o poller para, em vez de repetir as consultas para sempre.
+            None não para.
+
+    Exemplo:
+        >>> poller = TrackingPoller(correios, ler_codigos(), requests_per_minute=120, max_workers=4,
+        ...                         state=FileTrackingState('rastreio.json'), on_update=publicar)
+        >>> poller.run()
+    """
+
+    def __init__(self, client, codes=(), query_type='T', requests_per_minute=None, max_workers=4, intervals=None,
+                 fill_ahead=5 * 60, state=None, on_update=None, on_final=None, final_descriptions=FINAL_DESCRIPTIONS,
+                 max_auth_failures=3):
+        self.client = client
+        self.query_type = query_type
+        self.max_workers = max(1, max_workers)
+        self.intervals = dict(DEFAULT_INTERVALS, **(intervals or {}))
+        self.fill_ahead = fill_ahead
+        self.state = state if state is not None else MemoryTrackingState()
+        self.on_update = on_update
+        self.on_final = on_final
+        self.final_descriptions = final_descriptions
+        self.max_auth_failures = max_auth_failures
+        self.auth_failures = 0
+        self.budget = None
+        if requests_per_minute:
+            self.budget = TokenBucket(requests_per_minute / 60.0, burst=self.max_workers)
+        self.requests = 0
+        self.polled = 0
+        self.dropped = 0
+        self._heap = []
+        self._entries = {}
+        self._inflight = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.add(codes)
+
+    def add(self, codes, due=None):
+        """Agenda os códigos (por padrão para agora). Códigos já agendados têm o horário substituído."""
+        due = time.time() if due is None else due
+        with self._lock:
+            for code in codes:
+                self._schedule(normalize_code(code), due)
+
+    def remove(self, code):
+        """Tira o código da agenda."""
+        with self._lock:
+            code = normalize_code(code)
+            self._entries.pop(code, None)
+            self._inflight.discard(code)
+
+    def _schedule(self, code, due):
+        seq = next(self._seq)
+        self._entries[code] = seq
+        heapq.heappush(self._heap, (due, seq, code))
+
+    def _peek(self):
+        # Descarta do topo as entradas substituídas ou removidas e devolve a próxima válida.
+        while self._heap:
+            due, seq, code = self._heap[0]
+            if self._entries.get(code) == seq:
+                return due, code
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self._entries
+
+    def next_due(self):
+        """Horário (time.time()) da próxima consulta agendada, ou None se a agenda está vazia."""
+        with self._lock:
+            head = self._peek()
+            return head[0] if head else None
+
+    def _has_due(self, now):
+        head = self._peek()
+        return head is not None and head[0] <= now
+
+    def _take_lot(self, now):
+        # Retira da agenda os códigos vencidos (mais atrasados primeiro), até o limite de uma requisição.
+        lot = []
+        limit = self.client.tracking_limit
+        while len(lot) < limit:
+            head = self._peek()
+            if head is None or head[0] > (now + self.fill_ahead if lot else now):
+                break
+            heapq.heappop(self._heap)
+            del self._entries[head[1]]
+            self._inflight.add(head[1])
+            lot.append(head[1])
+        return lot
+
+    def _fetch(self, lot):
+        client = self.client
+        try:
+            # Sem novas tentativas do cliente: cada requisição gasta exatamente uma unidade do orçamento, e um lote
+            # que falha volta para a agenda (intervals['error']).
+            response = client._request('GET', f'{client.default_url}srorastro/v1/objetos', retry=False,
+                                       params=client._tracking_params(self.query_type, lot), headers=client.header())
+        except Exception as exc:
+            print(f"Falha ao consultar {len(lot)} códigos: {exc}")
+            return []
+        self._auth_result(response.status_code in AUTH_ERRORS)
+        return client._handle('srorastro', client._handle_tracking_response, response)
+
+    def _auth_result(self, failed):
+        # Um 401 descarta o token no cliente e o próximo lote autentica de novo; se a API continua recusando,
+        # as credenciais não servem mais.
+        with self._lock:
+            self.auth_failures = self.auth_failures + 1 if failed else 0
+            exhausted = self.max_auth_failures is not None and self.auth_failures >= self.max_auth_failures
+        if exhausted and not self._stop.is_set():
+            print(f"Autenticação recusada em {self.auth_failures} consultas seguidas; poller interrompido.")
+            self.stop()
+
+    def _complete(self, lot, packages):
+        now = time.time()
+        now_local = datetime.fromtimestamp(now, BRASILIA).replace(tzinfo=None)
+        found = {normalize_code(package.get('codObjeto')): package for package in packages}
+        updates = self.client._tracking_updates(packages, self.state)
+        finals = []
+        parsed = []
+        with self._lock:
+            for code in lot:
+                if code not in self._inflight:
+                    continue  # removido durante a consulta
+                self._inflight.discard(code)
+                if code in self._entries:
+                    continue  # reagendado por add() durante a consulta
+                package = found.get(code)
+                if package is None:
+                    self._schedule(code, now + self.intervals['error'])
+                    continue
+                tracking_object = self.client._parse_tracking_package(package)
+                parsed.append(tracking_object)
+                interval = poll_interval(tracking_object, now_local, self.intervals, self.final_descriptions)
+                if interval is None:
+                    finals.append(tracking_object)
+                else:
+                    self._schedule(code, now + interval)
+            self.requests += 1
+            self.polled += len(lot)
+            self.dropped += len(finals)
+
+        if self.client.tracking_store is not None and parsed:
+            self.client.tracking_store.upsert(parsed)
+
+        for tracking_object in finals:
+            self.state.discard(tracking_object.get('codigo'))
+            if self.on_final is not None:
+                self.on_final(tracking_object)
+        if self.on_update is not None:
+            for tracking_object in updates:
+                self.on_update(tracking_object)
+        return updates
+
+    def poll_once(self):
+        """
+        Consulta todos os códigos vencidos agora, respeitando o orçamento de requisições.
+
+        Returns:
+            list: Objetos com eventos novos (só os eventos novos), no formato de tracking_package.
+        """
+        updates = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
+            while not self._stop.is_set():
+                with self._lock:
+                    has_due = self._has_due(time.time())
+                if not has_due:
+                    break
+                if self.budget is not None:
+                    self.budget.acquire()
+                # O lote é montado depois de esperar pelo orçamento, com as prioridades daquele momento.
+                with self._lock:
+                    lot = self._take_lot(time.time())
+                if not lot:
+                    break
+                pending.append((lot, executor.submit(self._fetch, lot)))
+                if len(pending) >= self.max_workers:
+                    lot, future = pending.popleft()
+                    updates.extend(self._complete(lot, future.result()))
+            while pending:
+                lot, future = pending.popleft()
+                updates.extend(self._complete(lot, future.result()))
+        return updates
+
+    def run(self, idle=60.0):
+        """
+        Executa o poller até stop() ser chamado (em outra thread ou em um dos callbacks).
+
+        Com a agenda vazia ele continua aguardando códigos novos, incluídos por add().
+
+        Args:
+            idle (float): Espera máxima, em segundos, entre duas verificações da agenda.
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            self.poll_once()
+            due = self.next_due()
+            self._stop.wait(idle if due is None else min(idle, max(0.0, due - time.time())))
+
+    def stop(self):
+        """Interrompe run() depois das requisições em andamento (também chamado após max_auth_failures recusas)."""
+        self._stop.set()
+
+    def stats(self):
+        """Resumo do poller: códigos agendados e vencidos, requisições feitas, códigos consultados e retirados."""
+        with self._lock:
+            now = time.time()
+            due = sum(1 for d, seq, code in self._heap if d <= now and self._entries.get(code) == seq)
+            return {'codes': len(self._entries), 'due': due, 'inflight': len(self._inflight),
+                    'requests': self.requests, 'polled': self.polled, 'dropped': self.dropped,
+                    'auth_failures': self.auth_failures}
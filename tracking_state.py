@@ -0,0 +1,73 @@
+import json
+import os
+import tempfile
+import threading
+
+from tracking_cache import normalize_code
+
+
+class MemoryTrackingState:
+    """
+    Guarda, em memória, o último evento visto de cada código para o rastreamento incremental (tracking_updates).
+
+    O marcador de um evento é a tupla (dtHrCriado, descricao).
+    """
+
+    def __init__(self):
+        self._markers = {}
+        self._lock = threading.Lock()
+
+    def get(self, code):
+        """Retorna o marcador do último evento visto para o código, ou None."""
+        return self._markers.get(normalize_code(code))
+
+    def update(self, markers):
+        """Atualiza os marcadores a partir de um dicionário código -> (dtHrCriado, descricao)."""
+        with self._lock:
+            for code, marker in markers.items():
+                self._markers[normalize_code(code)] = tuple(marker)
+
+    def discard(self, code):
+        """Esquece o código (ex.: depois de entregue)."""
+        with self._lock:
+            self._markers.pop(normalize_code(code), None)
+
+
+class FileTrackingState(MemoryTrackingState):
+    """
+    Estado do rastreamento incremental persistido em um arquivo JSON, para sobreviver a reinícios.
+
+    Args:
+        path (str): Caminho do arquivo JSON. É lido na criação e regravado (de forma atômica) a cada atualização.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._markers = {code: tuple(marker) for code, marker in json.load(f).items()}
+        except (OSError, ValueError):
+            self._markers = {}
+
+    def update(self, markers):
+        super().update(markers)
+        self._save()
+
+    def discard(self, code):
+        super().discard(code)
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            data = {code: list(marker) for code, marker in self._markers.items()}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tracking-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
@@ -0,0 +1,364 @@
+import sqlite3
+import threading
+from datetime import timedelta
+
+from token_manager import brasilia_now, parse_correios_datetime, to_brasilia
+from tracking_cache import FINAL_DESCRIPTIONS, is_final, normalize_code
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objetos (
+    codigo TEXT PRIMARY KEY,
+    dt_prevista TEXT,
+    status TEXT,
+    dt_evento TEXT,
+    local TEXT,
+    cidade TEXT,
+    uf TEXT,
+    final INTEGER NOT NULL DEFAULT 0,
+    mensagem TEXT,
+    atualizado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS eventos (
+    codigo TEXT NOT NULL,
+    dt_evento TEXT,
+    descricao TEXT,
+    local TEXT,
+    cidade TEXT,
+    uf TEXT,
+    UNIQUE (codigo, dt_evento, descricao)
+);
+CREATE INDEX IF NOT EXISTS idx_objetos_status ON objetos (status, dt_evento);
+CREATE INDEX IF NOT EXISTS idx_objetos_uf ON objetos (uf, dt_evento);
+CREATE INDEX IF NOT EXISTS idx_objetos_cidade ON objetos (cidade, dt_evento);
+CREATE INDEX IF NOT EXISTS idx_objetos_dt_evento ON objetos (dt_evento);
+CREATE INDEX IF NOT EXISTS idx_objetos_dt_prevista ON objetos (final, dt_prevista);
+CREATE INDEX IF NOT EXISTS idx_eventos_dt_evento ON eventos (dt_evento);
+CREATE INDEX IF NOT EXISTS idx_eventos_uf ON eventos (uf, dt_evento);
+CREATE INDEX IF NOT EXISTS idx_eventos_cidade ON eventos (cidade, dt_evento);
+"""
+
+# O objeto só é atualizado se o último evento recebido não for mais antigo que o já gravado
+# (consultas 'P' ou respostas atrasadas não fazem a situação voltar atrás).
+_UPSERT_OBJECT = """
+INSERT INTO objetos (codigo, dt_prevista, status, dt_evento, local, cidade, uf, final, mensagem, atualizado_em)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (codigo) DO UPDATE SET
+    dt_prevista = COALESCE(excluded.dt_prevista, objetos.dt_prevista),
+    status = excluded.status,
+    dt_evento = excluded.dt_evento,
+    local = excluded.local,
+    cidade = excluded.cidade,
+    uf = excluded.uf,
+    final = excluded.final,
+    mensagem = excluded.mensagem,
+    atualizado_em = excluded.atualizado_em
+WHERE objetos.dt_evento IS NULL OR excluded.dt_evento >= objetos.dt_evento
+"""
+
+_INSERT_EVENT = """
+INSERT OR IGNORE INTO eventos (codigo, dt_evento, descricao, local, cidade, uf) VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_OBJECT_COLUMNS = ('codigo', 'dt_prevista', 'status', 'dt_evento', 'local', 'cidade', 'uf', 'final', 'mensagem',
+                   'atualizado_em')
+_GROUP_COLUMNS = ('status', 'uf', 'cidade', 'local', 'final')
+
+
+def _iso(value):
+    # Datas gravadas como texto ISO 8601 sem fuso (horário de Brasília, como vêm da API), que ordena como data.
+    # Datas com fuso são convertidas para o horário de Brasília.
+    value = to_brasilia(parse_correios_datetime(value))
+    if value is None:
+        return None
+    return value.isoformat(timespec='seconds')
+
+
+def _place(value):
+    # Cidade e UF são gravadas e comparadas em maiúsculas (inclusive letras acentuadas, que o COLLATE NOCASE do
+    # SQLite não trata): 'São Paulo', 'SÃO PAULO' e 'são paulo' encontram os mesmos objetos.
+    return None if value is None else str(value).strip().upper()
+
+
+def _object_row(row):
+    record = dict(zip(_OBJECT_COLUMNS, row))
+    record['final'] = bool(record['final'])
+    return record
+
+
+class SQLiteTrackingStore:
+    """
+    Armazenamento local (SQLite) dos objetos rastreados e dos seus eventos, para consultas sem chamar a API.
+
+    Cada objeto guarda a situação mais recente (status, data, local, cidade e UF do último evento, dtPrevista
+    e se a situação é final) e cada evento fica na tabela de eventos. Há índices por código, situação, UF,
+    cidade e data do evento. As gravações são feitas em lotes, em uma transação por lote. Cidade e UF são
+    gravadas em maiúsculas e os filtros por elas não diferenciam maiúsculas de minúsculas.
+
+    Pode ser informado ao cliente (tracking_store=...) para gravar tudo o que tracking_package,
+    tracking_package_iter e tracking_table consultam, ou alimentado diretamente com upsert.
+
+    Args:
+        path (str): Arquivo do banco. ':memory:' mantém tudo em memória.
+        batch_size (int): Objetos gravados por transação em upsert.
+        final_descriptions (tuple): Descrições de eventos considerados finais.
+
+    Exemplo:
+        >>> banco = SQLiteTrackingStore('rastreio.db')
+        >>> correios = ApiClientCorreios(..., tracking_store=banco)
+        >>> correios.tracking_package('T', codigos, max_workers=8)
+        >>> banco.stuck(days=3, uf='MG')
+        >>> banco.late()
+    """
+
+    def __init__(self, path=':memory:', batch_size=500, final_descriptions=FINAL_DESCRIPTIONS):
+        self.path = path
+        self.batch_size = batch_size
+        self.final_descriptions = final_descriptions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            # WAL permite que outros processos leiam o banco enquanto o cliente grava.
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._scalar('SELECT COUNT(*) FROM objetos')
+
+    def __contains__(self, code):
+        return self._scalar('SELECT 1 FROM objetos WHERE codigo = ?', (normalize_code(code),)) is not None
+
+    def _scalar(self, sql, params=()):
+        with self._lock:
+            row = self._conn.execute(sql, params).fetchone()
+        return row[0] if row else None
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _rows(self, tracking_object, now):
+        # Converte um objeto no formato de tracking_package na linha de 'objetos' e nas linhas de 'eventos'.
+        code = normalize_code(tracking_object.get('codigo'))
+        description = tracking_object.get('description')
+        if not isinstance(description, list):
+            return (code, _iso(tracking_object.get('dtPrevista')), None, None, None, None, None, 0, description,
+                    now), []
+
+        events = []
+        for i, descricao in enumerate(description):
+            events.append((code, _iso(tracking_object['dtEvent'][i]), descricao, tracking_object['local'][i],
+                           _place(tracking_object['cidade'][i]), _place(tracking_object['uf'][i])))
+        # A API lista os eventos do mais recente para o mais antigo.
+        last = events[0] if events else (code, None, None, None, None, None)
+        final = 1 if is_final(tracking_object, self.final_descriptions) else 0
+        return (code, _iso(tracking_object.get('dtPrevista')), last[2], last[1], last[3], last[4], last[5], final,
+                None, now), events
+
+    def upsert(self, tracking_objects):
+        """
+        Grava ou atualiza objetos no formato de tracking_package (lista ou gerador), em lotes de batch_size.
+
+        Eventos já gravados são ignorados, então objetos parciais (ex.: os de tracking_updates, só com os
+        eventos novos) também podem ser gravados.
+
+        Returns:
+            int: Quantidade de objetos processados.
+        """
+        now = brasilia_now().isoformat(timespec='seconds')
+        total = 0
+        objects, events = [], []
+        for tracking_object in tracking_objects:
+            row, rows = self._rows(tracking_object, now)
+            objects.append(row)
+            events.extend(rows)
+            if len(objects) >= self.batch_size:
+                total += self._write(objects, events)
+                objects, events = [], []
+        if objects:
+            total += self._write(objects, events)
+        return total
+
+    def _write(self, objects, events):
+        with self._lock, self._conn:
+            self._conn.executemany(_UPSERT_OBJECT, objects)
+            self._conn.executemany(_INSERT_EVENT, events)
+        return len(objects)
+
+    def get(self, code):
+        """Retorna o objeto no formato de tracking_package, montado a partir dos eventos gravados, ou None."""
+        code = normalize_code(code)
+        rows = self._query(f'SELECT {", ".join(_OBJECT_COLUMNS)} FROM objetos WHERE codigo = ?', (code,))
+        if not rows:
+            return None
+        record = _object_row(rows[0])
+        events = self._query('SELECT dt_evento, descricao, local, cidade, uf FROM eventos WHERE codigo = ? '
+                             'ORDER BY dt_evento DESC', (code,))
+        if not events and record['mensagem'] is not None:
+            return {'codigo': code, 'description': record['mensagem']}
+        return {
+            'codigo': code,
+            'dtPrevista': record['dt_prevista'],
+            'dtEvent': [e[0] for e in events],
+            'description': [e[1] for e in events],
+            'local': [e[2] for e in events],
+            'cidade': [e[3] for e in events],
+            'uf': [e[4] for e in events],
+        }
+
+    def find(self, status=None, uf=None, cidade=None, final=None, since=None, until=None, limit=None):
+        """
+        Busca objetos pela situação mais recente.
+
+        Args:
+            status (str, opcional): Início da descrição do último evento (ex.: 'Objeto em trânsito').
+            uf (str), cidade (str), opcionais: Local do último evento.
+            final (bool, opcional): Só objetos em situação final (True) ou ainda em andamento (False).
+            since, until (datetime ou str, opcionais): Intervalo da data do último evento.
+            limit (int, opcional): Quantidade máxima de objetos.
+
+        Returns:
+            list: Dicionários com as colunas de 'objetos', do último evento mais recente para o mais antigo.
+        """
+        where, params = [], []
+        if status is not None:
+            # Faixa em vez de LIKE, para usar o índice de status.
+            where.append('status >= ? AND status < ?')
+            params.extend((status, status + '\uffff'))
+        if uf is not None:
+            where.append('uf = ?')
+            params.append(_place(uf))
+        if cidade is not None:
+            where.append('cidade = ?')
+            params.append(_place(cidade))
+        if final is not None:
+            where.append('final = ?')
+            params.append(1 if final else 0)
+        if since is not None:
+            where.append('dt_evento >= ?')
+            params.append(_iso(since))
+        if until is not None:
+            where.append('dt_evento <= ?')
+            params.append(_iso(until))
+        return self._select_objects(where, params, 'dt_evento DESC', limit)
+
+    def _select_objects(self, where, params, order, limit=None):
+        sql = f'SELECT {", ".join(_OBJECT_COLUMNS)} FROM objetos'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += f' ORDER BY {order}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = list(params) + [int(limit)]
+        return [_object_row(row) for row in self._query(sql, params)]
+
+    def stuck(self, days=3, uf=None, cidade=None, now=None, limit=None):
+        """
+        Objetos em andamento sem eventos novos há pelo menos days dias (ex.: parados em uma UF).
+
+        Returns:
+            list: Como em find, do parado há mais tempo para o mais recente.
+        """
+        now = parse_correios_datetime(now) if now is not None else brasilia_now()
+        where, params = ['final = 0', 'dt_evento <= ?'], [_iso(now - timedelta(days=days))]
+        if uf is not None:
+            where.append('uf = ?')
+            params.append(_place(uf))
+        if cidade is not None:
+            where.append('cidade = ?')
+            params.append(_place(cidade))
+        return self._select_objects(where, params, 'dt_evento ASC', limit)
+
+    def late(self, now=None, include_final=False, uf=None, limit=None):
+        """
+        Objetos atrasados em relação a dtPrevista.
+
+        Args:
+            now (datetime ou str, opcional): Referência para os objetos em andamento. Padrão é agora.
+            include_final (bool): Inclui também os objetos finalizados depois de dtPrevista.
+            uf (str, opcional): UF do último evento.
+
+        Returns:
+            list: Como em find, da dtPrevista mais antiga para a mais recente.
+        """
+        now = parse_correios_datetime(now) if now is not None else brasilia_now()
+        condition = '(final = 0 AND dt_prevista < ?)'
+        params = [_iso(now)]
+        if include_final:
+            condition = f'({condition} OR (final = 1 AND dt_evento > dt_prevista))'
+        where = ['dt_prevista IS NOT NULL', condition]
+        if uf is not None:
+            where.append('uf = ?')
+            params.append(_place(uf))
+        return self._select_objects(where, params, 'dt_prevista ASC', limit)
+
+    def events(self, code=None, uf=None, cidade=None, since=None, until=None, limit=None):
+        """
+        Busca eventos (de qualquer objeto) por código, local e período.
+
+        Returns:
+            list: Dicionários (codigo, dt_evento, descricao, local, cidade, uf), do mais recente para o mais antigo.
+        """
+        where, params = [], []
+        if code is not None:
+            where.append('codigo = ?')
+            params.append(normalize_code(code))
+        if uf is not None:
+            where.append('uf = ?')
+            params.append(_place(uf))
+        if cidade is not None:
+            where.append('cidade = ?')
+            params.append(_place(cidade))
+        if since is not None:
+            where.append('dt_evento >= ?')
+            params.append(_iso(since))
+        if until is not None:
+            where.append('dt_evento <= ?')
+            params.append(_iso(until))
+        sql = 'SELECT codigo, dt_evento, descricao, local, cidade, uf FROM eventos'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY dt_evento DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        columns = ('codigo', 'dt_evento', 'descricao', 'local', 'cidade', 'uf')
+        return [dict(zip(columns, row)) for row in self._query(sql, params)]
+
+    def count_by(self, column, final=None):
+        """
+        Conta os objetos agrupados pela situação mais recente.
+
+        Args:
+            column (str): 'status', 'uf', 'cidade', 'local' ou 'final'.
+            final (bool, opcional): Só objetos em situação final (True) ou em andamento (False).
+
+        Returns:
+            dict: Valor da coluna -> quantidade de objetos, do mais frequente para o menos frequente.
+        """
+        if column not in _GROUP_COLUMNS:
+            raise ValueError(f"column deve ser um de {', '.join(_GROUP_COLUMNS)}.")
+        sql = f'SELECT {column}, COUNT(*) FROM objetos'
+        params = ()
+        if final is not None:
+            sql += ' WHERE final = ?'
+            params = (1 if final else 0,)
+        sql += f' GROUP BY {column} ORDER BY COUNT(*) DESC'
+        return {value: count for value, count in self._query(sql, params)}
+
+    def codes(self, final=False):
+        """Lista os códigos gravados; por padrão só os ainda em andamento (ex.: para alimentar o TrackingPoller)."""
+        if final is None:
+            return [row[0] for row in self._query('SELECT codigo FROM objetos')]
+        return [row[0] for row in self._query('SELECT codigo FROM objetos WHERE final = ?', (1 if final else 0,))]
@@ -0,0 +1,232 @@
+import math
+from array import array
+from datetime import datetime, timedelta
+
+from token_manager import parse_correios_datetime, to_brasilia
+
+_EPOCH = datetime(1970, 1, 1)
+_NAT = float('nan')
+
+
+def _to_seconds(value):
+    # Datas da API vêm sem fuso (horário de Brasília); são guardadas como segundos desde 1970 sem conversão.
+    # Datas com fuso são convertidas para o horário de Brasília, como em tracking_store e tracking_poller.
+    value = to_brasilia(parse_correios_datetime(value))
+    if value is None:
+        return _NAT
+    return (value - _EPOCH).total_seconds()
+
+
+def _from_seconds(value):
+    if math.isnan(value):
+        return None
+    return _EPOCH + timedelta(seconds=value)
+
+
+def _to_text(value):
+    # Volta ao texto ISO 8601 sem fuso usado pela API (ex.: '2024-04-06T11:33:29').
+    value = _from_seconds(value)
+    return None if value is None else value.isoformat(timespec='seconds')
+
+
+class StringDictionary:
+    """
+    Codificação por dicionário: cada texto distinto é guardado uma única vez e referenciado por um inteiro.
+    Valores ausentes (None) recebem o código -1.
+    """
+
+    __slots__ = ('values', '_index')
+
+    def __init__(self):
+        self.values = []
+        self._index = {}
+
+    def encode(self, value):
+        """Retorna o código do texto, incluindo-o no dicionário se necessário."""
+        if value is None:
+            return -1
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        return code
+
+    def decode(self, code):
+        return None if code < 0 else self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class TrackingTable:
+    """
+    Representação compacta (colunar) dos resultados de tracking_package, para manter milhões de eventos em memória.
+
+    Em vez de um dicionário com cinco listas por objeto, os eventos ficam em colunas do módulo array:
+    datas convertidas em segundos (float), e descrição, local, cidade e UF codificados por dicionário
+    (cada texto repetido é guardado uma vez). As colunas podem ser exportadas para NumPy, pandas ou Arrow.
+
+    Exemplo:
+        >>> tabela = TrackingTable.from_tracking(correios.tracking_package_iter('T', codigos))
+        >>> eventos = tabela.to_pandas()
+    """
+
+    def __init__(self):
+        # Colunas por objeto
+        self.codigo = []
+        self.dtPrevista = array('d')
+        self.mensagem = []
+        self.event_start = array('L')
+        # Colunas por evento
+        self.event_object = array('L')
+        self.dtEvent = array('d')
+        self.description = array('l')
+        self.local = array('l')
+        self.cidade = array('l')
+        self.uf = array('l')
+        self.descriptions = StringDictionary()
+        self.places = StringDictionary()
+        self.cities = StringDictionary()
+        self.ufs = StringDictionary()
+
+    @classmethod
+    def from_tracking(cls, tracking_objects):
+        """Cria a tabela a partir de objetos no formato de tracking_package (lista ou gerador)."""
+        table = cls()
+        table.extend(tracking_objects)
+        return table
+
+    def append(self, tracking_object):
+        """Acrescenta um objeto no formato de tracking_package."""
+        index = len(self.codigo)
+        self.codigo.append(tracking_object.get('codigo'))
+        self.dtPrevista.append(_to_seconds(tracking_object.get('dtPrevista')))
+        self.event_start.append(len(self.dtEvent))
+
+        description = tracking_object.get('description')
+        if not isinstance(description, list):
+            # Objeto sem eventos (ex.: não encontrado): a mensagem da API fica em 'description'.
+            self.mensagem.append(description)
+            return
+        self.mensagem.append(None)
+
+        columns = zip(tracking_object.get('dtEvent'), description, tracking_object.get('local'),
+                      tracking_object.get('cidade'), tracking_object.get('uf'))
+        for dt_event, descricao, local, cidade, uf in columns:
+            self.event_object.append(index)
+            self.dtEvent.append(_to_seconds(dt_event))
+            self.description.append(self.descriptions.encode(descricao))
+            self.local.append(self.places.encode(local))
+            self.cidade.append(self.cities.encode(cidade))
+            self.uf.append(self.ufs.encode(uf))
+
+    def extend(self, tracking_objects):
+        for tracking_object in tracking_objects:
+            self.append(tracking_object)
+
+    def __len__(self):
+        return len(self.codigo)
+
+    @property
+    def n_events(self):
+        return len(self.dtEvent)
+
+    def _event_range(self, index):
+        start = self.event_start[index]
+        end = self.event_start[index + 1] if index + 1 < len(self.event_start) else len(self.dtEvent)
+        return range(start, end)
+
+    def object(self, index):
+        """
+        Reconstrói o objeto na posição informada no formato de tracking_package, com dtPrevista e dtEvent
+        em texto ISO 8601 sem fuso (horário de Brasília), como vêm da API.
+        """
+        tracking_object = {'codigo': self.codigo[index]}
+        if self.mensagem[index] is not None:
+            tracking_object['description'] = self.mensagem[index]
+            return tracking_object
+        events = self._event_range(index)
+        tracking_object.update({
+            'dtPrevista': _to_text(self.dtPrevista[index]),
+            'dtEvent': [_to_text(self.dtEvent[i]) for i in events],
+            'description': [self.descriptions.decode(self.description[i]) for i in events],
+            'local': [self.places.decode(self.local[i]) for i in events],
+            'cidade': [self.cities.decode(self.cidade[i]) for i in events],
+            'uf': [self.ufs.decode(self.uf[i]) for i in events],
+        })
+        return tracking_object
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.object(index)
+
+    def events(self):
+        """Itera sobre os eventos como tuplas (codigo, dtEvent, description, local, cidade, uf), com dtEvent em datetime."""
+        for i in range(len(self.dtEvent)):
+            yield (self.codigo[self.event_object[i]], _from_seconds(self.dtEvent[i]),
+                   self.descriptions.decode(self.description[i]), self.places.decode(self.local[i]),
+                   self.cities.decode(self.cidade[i]), self.ufs.decode(self.uf[i]))
+
+    def to_numpy(self):
+        """
+        Exporta os eventos como um dicionário de arrays NumPy.
+
+        As colunas de texto vêm como códigos inteiros (-1 para ausente); os valores correspondentes estão
+        nas chaves '<coluna>_values'. As datas vêm como datetime64[s].
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError("A exportação para NumPy requer o pacote numpy (pip install numpy).")
+
+        def datetimes(column):
+            seconds = np.frombuffer(column, dtype=np.float64) if len(column) else np.zeros(0)
+            result = np.full(len(seconds), np.datetime64('NaT'), dtype='datetime64[s]')
+            valid = ~np.isnan(seconds)
+            result[valid] = seconds[valid].astype('int64').astype('datetime64[s]')
+            return result
+
+        return {
+            'codigo': np.asarray(self.codigo, dtype=object)[np.asarray(self.event_object, dtype=np.int64)],
+            'dtPrevista': datetimes(self.dtPrevista)[np.asarray(self.event_object, dtype=np.int64)],
+            'dtEvent': datetimes(self.dtEvent),
+            'description': np.asarray(self.description, dtype=np.int64),
+            'description_values': np.asarray(self.descriptions.values, dtype=object),
+            'local': np.asarray(self.local, dtype=np.int64),
+            'local_values': np.asarray(self.places.values, dtype=object),
+            'cidade': np.asarray(self.cidade, dtype=np.int64),
+            'cidade_values': np.asarray(self.cities.values, dtype=object),
+            'uf': np.asarray(self.uf, dtype=np.int64),
+            'uf_values': np.asarray(self.ufs.values, dtype=object),
+        }
+
+    def to_pandas(self):
+        """Exporta os eventos para um pandas.DataFrame, com as colunas de texto como Categorical."""
+        try:
+            import pandas as pd
+        except ImportError:
+            raise ImportError("A exportação para pandas requer o pacote pandas (pip install pandas).")
+        columns = self.to_numpy()
+        data = {'codigo': columns['codigo'], 'dtPrevista': columns['dtPrevista'], 'dtEvent': columns['dtEvent']}
+        for name in ('description', 'local', 'cidade', 'uf'):
+            data[name] = pd.Categorical.from_codes(columns[name], categories=pd.Index(columns[f'{name}_values']))
+        return pd.DataFrame(data)
+
+    def to_arrow(self):
+        """Exporta os eventos para uma pyarrow.Table, com as colunas de texto como DictionaryArray."""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("A exportação para Arrow requer o pacote pyarrow (pip install pyarrow).")
+        columns = self.to_numpy()
+        data = {
+            'codigo': pa.array(columns['codigo'].tolist(), type=pa.string()),
+            'dtPrevista': pa.array(columns['dtPrevista']),
+            'dtEvent': pa.array(columns['dtEvent']),
+        }
+        for name in ('description', 'local', 'cidade', 'uf'):
+            indices = pa.array(columns[name], type=pa.int32(), mask=columns[name] < 0)
+            data[name] = pa.DictionaryArray.from_arrays(indices,
+                                                        pa.array(columns[f'{name}_values'].tolist(), type=pa.string()))
+        return pa.table(data)